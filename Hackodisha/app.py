@@ -1,43 +1,146 @@
 import sys
 import os
-import traceback
+import logging
+import threading
+import time
 
 # Add current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from flask import Flask, Response, g, render_template, request, jsonify, flash, redirect, url_for
 import json
 import numpy as np
-import pandas as pd
 from datetime import datetime
 import joblib
 
+from ml_models.allocation_grid import AllocationGrid
+from ml_models.onnx_backend import ONNX_FILE, OnnxAllocationModel
+from ml_models.features import FEATURE_NAMES, PROFILE_DEFAULTS, profile_features, risk_capacity
+from ml_models.tree_compiler import ScaledEstimator, compile_ensemble
+import app_logging
+import sampling_profiler
+from tracing import Tracer
+from model_reloader import ModelReloader
+from recommendation_cache import RecommendationCache
+from stage_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, StageMetrics
+
+log = logging.getLogger(app_logging.LOGGER)
+# Per-request messages, rate limited per message
+request_log = logging.getLogger(app_logging.REQUEST_LOGGER)
+
 # Import configuration
 try:
     from config import Config
-    print("✅ Config imported successfully")
 except ImportError as e:
-    print(f"❌ Error importing config: {e}")
+    log.critical("❌ Error importing config: %s", e)
     sys.exit(1)
 
+app_logging.setup_logging(Config.LOG_LEVEL, Config.LOG_FORMAT, Config.LOG_RATE_LIMIT, Config.LOG_QUEUE_SIZE)
+log.info("✅ Config imported successfully")
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_models', 'saved_models')
+
+# Spans for each request and its stages, appended to TRACE_DIR (see tracing.py)
+tracer = Tracer('hackodisha', Config.TRACE_DIR, Config.TRACE_SAMPLE_RATE)
+
+# Per-route, per-stage latency histograms served on /metrics; traced
+# requests also get their stages recorded as spans
+stage_metrics = StageMetrics(Config.METRICS_SAMPLE_RATE, tracer=tracer)
+
 # ML Predictor Class
 class MLInvestmentPredictor:
     """ML-powered investment predictor using saved pickle files"""
     
-    def __init__(self):
+    def __init__(self, lazy=False):
         self.models = None
         self.scaler = None
         self.feature_names = None
         self.metadata = None
-        self.ml_available = False
-        self.load_models()
+        self.models_loaded = False
+        self.backend = None
+        self.onnx_model = None
+        self.model_version = None
+        self.grid = None
+        self.cache = RecommendationCache(Config.RECOMMENDATION_CACHE_SIZE, Config.RECOMMENDATION_CACHE_TTL)
+        
+        # Startup state: loaded is set once a load attempt has finished,
+        # ready once the warm-up prediction has run as well
+        self.lazy = lazy
+        self.loaded = threading.Event()
+        self.ready = threading.Event()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.loaded_at = None
+        
+        if lazy:
+            threading.Thread(target=self.start_up, name='ml-model-loader', daemon=True).start()
+        else:
+            self.start_up()
+    
+    @property
+    def ml_available(self):
+        """Whether ML predictions can be served; waits for a background load in progress"""
+        if not self.loaded.is_set():
+            self.loaded.wait(Config.ML_LOAD_WAIT_SECONDS)
+        return self.models_loaded
+    
+    def start_up(self):
+        """Load the models, then run a warm-up prediction before reporting ready"""
+        start = time.perf_counter()
+        try:
+            self.load_models(mmap_mode='r' if self.lazy else None)
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self.loaded_at = datetime.now().isoformat()
+            self.loaded.set()
+        
+        if self.models_loaded:
+            start = time.perf_counter()
+            self.warm_up()
+            self.warmup_seconds = time.perf_counter() - start
+            log.info("🔥 Models warmed up (load %.2fs, warm-up %.2fs)", self.load_seconds, self.warmup_seconds)
+        self.ready.set()
     
-    def load_models(self):
-        """Load all ML models from pickle files"""
+    def warm_up(self):
+        """
+        Run synthetic predictions through every serving path so the first
+        real request does not pay for first-call costs (lazy imports,
+        page faults on memory-mapped arrays, allocator growth)
+        """
         try:
-            # Resolve model path relative to this file to avoid CWD issues
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(base_dir, 'ml_models', 'saved_models')
+            self.generate_ml_recommendations(dict(PROFILE_DEFAULTS))
+            self.generate_ml_recommendations_many([dict(PROFILE_DEFAULTS)] * 2)
+        except Exception as e:
+            log.warning("⚠️ Warm-up prediction failed: %s", e)
+    
+    def smoke_test(self):
+        """Raise ValueError unless a synthetic prediction comes back well-formed"""
+        results = self.predict_many([dict(PROFILE_DEFAULTS)])
+        if not results:
+            raise ValueError("smoke prediction failed")
+        allocations = np.array(list(results[0]['allocations'].values()) + [results[0]['expected_return']])
+        if not np.isfinite(allocations).all() or abs(allocations[:-1].sum() - 1) > 1e-6:
+            raise ValueError(f"smoke prediction returned invalid allocations: {results[0]['allocations']}")
+    
+    def startup_info(self):
+        """Active model version and load timings for /health and /model_info"""
+        return {
+            'mode': 'lazy' if self.lazy else 'eager',
+            'model_version': self.model_version,
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds
+        }
+    
+    def load_models(self, mmap_mode=None):
+        """
+        Load all ML models from pickle files
+        
+        mmap_mode='r' memory-maps the arrays inside the pickles instead of
+        reading them into memory, which makes loading much faster.
+        """
+        try:
+            model_path = MODEL_DIR
             
             # Check if pickle files exist
             required_files = ['ml_models.pkl', 'scaler.pkl', 'feature_names.pkl', 'metadata.pkl']
@@ -48,140 +151,158 @@ class MLInvestmentPredictor:
                     missing_files.append(file)
             
             if missing_files:
-                print(f"⚠️ Missing ML files: {missing_files}")
-                print("   Run pickle generation scripts first!")
+                log.warning("⚠️ Missing ML files: %s. Run pickle generation scripts first!", missing_files)
                 return False
             
             # Load all pickle files
-            self.models = joblib.load(os.path.join(model_path, 'ml_models.pkl'))
+            self.models = joblib.load(os.path.join(model_path, 'ml_models.pkl'), mmap_mode=mmap_mode)
             self.scaler = joblib.load(os.path.join(model_path, 'scaler.pkl'))
             self.feature_names = joblib.load(os.path.join(model_path, 'feature_names.pkl'))
             self.metadata = joblib.load(os.path.join(model_path, 'metadata.pkl'))
             
-            self.ml_available = True
-            print("✅ ML models loaded successfully!")
-            print(f"📅 Models trained on: {self.metadata.get('training_date', 'Unknown')}")
-            print(f"📊 Training samples: {self.metadata.get('training_samples', 'Unknown'):,}")
+            if list(self.feature_names) != FEATURE_NAMES:
+                log.error("❌ feature_names.pkl does not match ml_models/features.py: %s", self.feature_names)
+                return False
+            
+            self.select_backend(Config.ML_INFERENCE_BACKEND)
+            
+            # Identifies this model set (models and the scaler their inputs
+            # go through) in cache keys, the allocation grid and on /health
+            trained, scaled = (
+                datetime.fromtimestamp(os.path.getmtime(os.path.join(model_path, name))).isoformat(timespec='seconds')
+                for name in ('ml_models.pkl', 'scaler.pkl')
+            )
+            self.model_version = f"{self.metadata.get('model_version', 'unknown')}@{trained}+scaler@{scaled}"
+            
+            if Config.USE_ALLOCATION_GRID:
+                self.grid = self.load_grid(model_path)
+            
+            self.models_loaded = True
+            log.info("✅ ML models loaded successfully!")
+            log.info("📅 Models trained on: %s", self.metadata.get('training_date', 'Unknown'))
+            log.info("📊 Training samples: %s", f"{self.metadata.get('training_samples', 'Unknown'):,}")
             
             return True
             
         except Exception as e:
-            print(f"❌ Error loading ML models: {e}")
-            self.ml_available = False
+            log.exception("❌ Error loading ML models: %s", e)
+            self.models_loaded = False
             return False
     
+    def load_grid(self, model_path):
+        """Memory-map the precomputed allocation grid if it matches these models"""
+        grid = AllocationGrid.load(model_path)
+        if grid is None:
+            log.warning("⚠️ No allocation grid found; run build_allocation_grid.py to create one")
+            return None
+        if grid.model_version != self.model_version:
+            log.warning("⚠️ Ignoring allocation grid built for models %s (loaded %s)", grid.model_version, self.model_version)
+            return None
+        log.info("🗺️ Allocation grid loaded: %s cells", grid.grid.shape[:-1])
+        return grid
+    
+    def select_backend(self, backend):
+        """
+        Pick the estimator each model group predicts with
+        
+        'compiled' flattens the tree ensembles into array evaluators with
+        the scaler folded into their thresholds (ml_models/tree_compiler.py);
+        'sklearn' calls the pickled estimators; 'onnx' answers every model
+        with one onnxruntime call on the exported ml_models.onnx, falling
+        back to 'compiled' when onnxruntime or an export matching the loaded
+        pickles is missing. Models that cannot be compiled keep using sklearn.
+        Every predictor takes unscaled features.
+        """
+        if backend not in ('compiled', 'sklearn', 'onnx'):
+            log.warning("⚠️ Unknown inference backend %r, using sklearn", backend)
+            backend = 'sklearn'
+        
+        self.onnx_model = None
+        if backend == 'onnx':
+            self.onnx_model = self.load_onnx_model()
+            if self.onnx_model is None:
+                backend = 'compiled'
+        
+        model_infos = list(self.models.get('portfolio_allocator', {}).values())
+        for group in ('allocation_model', 'return_predictor'):
+            if group in self.models:
+                model_infos.append(self.models[group])
+        
+        for model_info in model_infos:
+            model_info['predictor'] = ScaledEstimator(model_info['model'], self.scaler)
+            if backend == 'compiled':
+                try:
+                    model_info['predictor'] = compile_ensemble(model_info['model'], self.scaler)
+                except ValueError as e:
+                    log.warning("⚠️ Using sklearn for %s: %s", type(model_info['model']).__name__, e)
+        
+        self.backend = backend
+        log.info("⚙️ Inference backend: %s", backend)
+    
+    def load_onnx_model(self):
+        """onnxruntime session for ml_models.onnx if it was exported from the loaded pickles"""
+        onnx_path = os.path.join(MODEL_DIR, ONNX_FILE)
+        if not os.path.exists(onnx_path):
+            log.warning("⚠️ No ml_models.onnx found; run export_onnx.py to create one")
+            return None
+        try:
+            onnx_model = OnnxAllocationModel(onnx_path, threads=Config.ONNX_THREADS)
+        except ImportError as e:
+            log.warning("⚠️ ONNX backend unavailable: %s", e)
+            return None
+        if not onnx_model.matches(os.path.join(MODEL_DIR, 'ml_models.pkl'), os.path.join(MODEL_DIR, 'scaler.pkl')):
+            log.warning("⚠️ Ignoring ml_models.onnx exported from different pickles; run export_onnx.py again")
+            return None
+        return onnx_model
+    
     def extract_features(self, user_profile):
         """Extract and engineer features from user profile"""
         try:
-            # Get basic info
-            age = user_profile.get('age', 30)
-            monthly_income = user_profile.get('avg_monthly_income', 50000)
-            monthly_expenses = user_profile.get('monthly_expenses', 30000)
-            surplus = monthly_income - monthly_expenses
-            dependents = user_profile.get('dependents', 1)
-            income_stability = user_profile.get('income_stability', 3)
-            
-            # Calculate derived features
-            surplus_to_income_ratio = surplus / monthly_income if monthly_income > 0 else 0
-            expense_ratio = monthly_expenses / monthly_income if monthly_income > 0 else 1
-            
-            # Calculate risk capacity
-            risk_capacity = self.calculate_risk_capacity(age, income_stability, dependents, surplus)
-            
-            # Calculate interaction features
-            age_income_interaction = age * monthly_income / 100000
-            stability_surplus_interaction = income_stability * surplus / 1000
-            
-            # Create feature array in correct order
-            features = [
-                age,
-                monthly_income,
-                monthly_expenses,
-                surplus,
-                dependents,
-                income_stability,
-                surplus_to_income_ratio,
-                expense_ratio,
-                risk_capacity,
-                age_income_interaction,
-                stability_surplus_interaction
-            ]
-            
-            return np.array(features).reshape(1, -1)
+            return profile_features([user_profile])
             
         except Exception as e:
-            print(f"Error extracting features: {e}")
+            request_log.exception("Error extracting features: %s", e)
             return None
     
     def calculate_risk_capacity(self, age, income_stability, dependents, surplus):
         """Calculate risk capacity score (1-10 scale)"""
-        risk_score = 5  # Start with neutral
-        
-        # Age factor (younger = higher risk tolerance)
-        if age < 30:
-            risk_score += 2
-        elif age < 40:
-            risk_score += 1
-        elif age > 50:
-            risk_score -= 1
-        elif age > 55:
-            risk_score -= 2
-        
-        # Income stability factor
-        risk_score += (income_stability - 3)  # Stability around 3 is neutral
-        
-        # Dependents factor (more dependents = lower risk)
-        risk_score -= dependents * 0.5
-        
-        # Surplus factor
-        if surplus > 50000:
-            risk_score += 2
-        elif surplus > 20000:
-            risk_score += 1
-        elif surplus < 10000:
-            risk_score -= 1
-        
-        # Ensure score is within bounds
-        return max(1, min(10, risk_score))
+        return float(risk_capacity(age, income_stability, dependents, surplus)[0])
     
     def predict_portfolio_allocation(self, user_profile):
         """Predict optimal portfolio allocation using ML"""
         if not self.ml_available:
             return None
         
+        if self.grid is not None:
+            # Answer from the precomputed grid, live inference outside it
+            results = self.predict_many([user_profile])
+            return results[0] if results else None
+        
         try:
-            # Extract and scale features
-            features = self.extract_features(user_profile)
+            # Extract features
+            with stage_metrics.stage('features'):
+                features = self.extract_features(user_profile)
             if features is None:
                 return None
             
-            features_scaled = self.scaler.transform(features)
-            
             # Get predictions from portfolio models
             allocations = {}
-            confidence_scores = {}
+            targets, predictions, returns, confidence_scores = self.model_outputs(features)
             
-            portfolio_models = self.models.get('portfolio_allocator', {})
-            
-            for target, model_info in portfolio_models.items():
-                model = model_info['model']
-                prediction = model.predict(features_scaled)[0]
+            with stage_metrics.stage('normalize'):
+                for target, prediction in zip(targets, predictions[0]):
+                    # Ensure allocation is between 0 and 1
+                    allocation = max(0, min(1, prediction))
+                    allocations[target.replace('_allocation', '')] = allocation
                 
-                # Ensure allocation is between 0 and 1
-                allocation = max(0, min(1, prediction))
-                allocations[target.replace('_allocation', '')] = allocation
+                # Normalize allocations to sum to 1
+                total_allocation = sum(allocations.values())
+                if total_allocation > 0:
+                    for key in allocations:
+                        allocations[key] = allocations[key] / total_allocation
                 
-                # Use CV score as confidence
-                confidence_scores[target] = model_info.get('cv_score', 0.5)
-            
-            # Normalize allocations to sum to 1
-            total_allocation = sum(allocations.values())
-            if total_allocation > 0:
-                for key in allocations:
-                    allocations[key] = allocations[key] / total_allocation
-            
-            # Predict expected return
-            expected_return = self.predict_expected_return(features_scaled)
+                # Expected return, kept in a realistic range (4-18%)
+                expected_return = 8.0 if returns is None else max(4.0, min(18.0, returns[0]))
             
             return {
                 'allocations': allocations,
@@ -192,25 +313,144 @@ class MLInvestmentPredictor:
             }
             
         except Exception as e:
-            print(f"ML prediction error: {e}")
+            request_log.exception("ML prediction error: %s", e)
             return None
     
-    def predict_expected_return(self, features_scaled):
+    def model_outputs(self, features):
+        """
+        Raw model predictions for unscaled feature rows
+        
+        Returns (allocation targets, allocation predictions with one column
+        per target, expected returns or None, confidence per target). The
+        ONNX backend and multi-output artifacts answer everything with a
+        single call; otherwise each per-target model and the return model is
+        called once. Each call is timed as a 'predict' stage labelled with
+        the model; scaling happens inside the predictors and is included.
+        """
+        if self.onnx_model is not None:
+            with stage_metrics.stage('predict', 'onnx'):
+                return self.onnx_model.outputs(features)
+        
+        if self.models.get('multi_output'):
+            model_info = self.models['allocation_model']
+            with stage_metrics.stage('predict', 'allocation_model'):
+                outputs = np.asarray(model_info['predictor'].predict(features)).reshape(len(features), -1)
+            columns = dict(zip(model_info['targets'], outputs.T))
+            targets = [target for target in model_info['targets'] if target != 'expected_return']
+            predictions = np.column_stack([columns[target] for target in targets])
+            returns = columns.get('expected_return')
+            confidence_scores = {
+                target: model_info.get('target_cv_scores', {}).get(target, model_info.get('cv_score', 0.5))
+                for target in targets
+            }
+        else:
+            portfolio_models = self.models.get('portfolio_allocator', {})
+            targets = list(portfolio_models)
+            columns = []
+            for target in targets:
+                with stage_metrics.stage('predict', target):
+                    columns.append(portfolio_models[target]['predictor'].predict(features))
+            predictions = np.column_stack(columns) if targets else np.zeros((len(features), 0))
+            returns = None
+            # Use CV score as confidence
+            confidence_scores = {
+                target: model_info.get('cv_score', 0.5) for target, model_info in portfolio_models.items()
+            }
+        
+        if returns is None:
+            return_model = self.models.get('return_predictor', {}).get('predictor')
+            if return_model is not None:
+                with stage_metrics.stage('predict', 'expected_return'):
+                    returns = return_model.predict(features)
+        
+        return targets, predictions, returns, confidence_scores
+    
+    def predict_expected_return(self, features):
         """Predict expected portfolio return"""
         try:
-            return_model = self.models.get('return_predictor', {}).get('model')
-            if return_model is None:
+            returns = self.model_outputs(features)[2]
+            if returns is None:
                 return 8.0  # Default return
             
-            predicted_return = return_model.predict(features_scaled)[0]
+            predicted_return = returns[0]
             
             # Ensure realistic return range (4-18%)
             return max(4.0, min(18.0, predicted_return))
             
         except Exception as e:
-            print(f"Return prediction error: {e}")
+            request_log.exception("Return prediction error: %s", e)
             return 8.0
     
+    def allocation_arrays(self, features):
+        """
+        Final allocations and expected returns for unscaled feature rows
+        
+        Returns (targets, allocations clipped to [0, 1] and normalized per
+        row, expected returns clipped to 4-18%, confidence per target).
+        """
+        targets, predictions, returns, confidence_scores = self.model_outputs(features)
+        
+        with stage_metrics.stage('normalize'):
+            allocations = np.clip(predictions, 0, 1)
+            totals = allocations.sum(axis=1, keepdims=True)
+            allocations = np.divide(allocations, totals, out=allocations, where=totals > 0)
+            
+            if returns is None:
+                expected_returns = np.full(len(features), 8.0)
+            else:
+                expected_returns = np.clip(returns, 4.0, 18.0)
+        
+        return targets, allocations, expected_returns, confidence_scores
+    
+    def predict_many(self, user_profiles):
+        """
+        Batch version of predict_portfolio_allocation
+        
+        Builds one feature matrix and calls each model once
+        for all profiles. Returns a list of
+        results shaped like predict_portfolio_allocation's, or None when ML
+        is unavailable or fails.
+        """
+        if not self.ml_available:
+            return None
+        if not user_profiles:
+            return []
+        
+        try:
+            with stage_metrics.stage('features'):
+                features = profile_features(user_profiles)
+            
+            if self.grid is None:
+                targets, allocations, expected_returns, confidence_scores = self.allocation_arrays(features)
+                from_grid = np.zeros(len(features), dtype=bool)
+            else:
+                with stage_metrics.stage('grid_lookup'):
+                    from_grid, allocations, expected_returns = self.grid.lookup_many(features)
+                targets, confidence_scores = self.grid.targets, self.grid.confidence_scores
+                live = ~from_grid
+                if live.any():
+                    _, allocations[live], expected_returns[live], _ = self.allocation_arrays(features[live])
+            
+            names = [target.replace('_allocation', '') for target in targets]
+            prediction_date = datetime.now().isoformat()
+            with stage_metrics.stage('format'):
+                return [
+                    {
+                        'allocations': dict(zip(names, row)),
+                        'expected_return': expected_return,
+                        'confidence_scores': confidence_scores,
+                        'model_used': 'ML (precomputed grid)' if grid_hit else 'ML',
+                        'prediction_date': prediction_date
+                    }
+                    for row, expected_return, grid_hit in zip(
+                        allocations.tolist(), expected_returns.tolist(), from_grid.tolist()
+                    )
+                ]
+            
+        except Exception as e:
+            request_log.exception("ML batch prediction error: %s", e)
+            return None
+    
     def generate_ml_recommendations(self, user_profile):
         """Generate detailed investment recommendations using ML predictions"""
         ml_results = self.predict_portfolio_allocation(user_profile)
@@ -218,10 +458,72 @@ class MLInvestmentPredictor:
         if ml_results is None:
             return self.fallback_recommendation(user_profile)
         
-        allocations = ml_results['allocations']
+        return self.build_recommendations(user_profile, ml_results)
+    
+    def recommend(self, user_profile):
+        """
+        generate_ml_recommendations through the result cache
+        
+        Keyed by the normalized profile and model version; concurrent
+        identical requests share one computation. Rule-based fallbacks are
+        not cached so recovery of the models shows up immediately.
+        """
+        key = (
+            self.model_version,
+            int(user_profile.get('avg_monthly_income', 50000)),
+            int(user_profile.get('monthly_expenses', 30000)),
+            int(user_profile.get('age', 30)),
+            int(user_profile.get('dependents', 1)),
+            int(user_profile.get('income_stability', 3)),
+        )
+        return self.cache.get_or_compute(
+            key,
+            lambda: self.generate_ml_recommendations(user_profile),
+            cacheable=lambda result: result.get('ml_metadata', {}).get('model_used') == 'ML-Powered'
+        )
+    
+    def generate_ml_recommendations_many(self, user_profiles):
+        """generate_ml_recommendations for many profiles with one batched prediction"""
+        ml_results = self.predict_many(user_profiles)
+        
+        if ml_results is None:
+            return [self.fallback_recommendation(profile) for profile in user_profiles]
+        
+        return [
+            self.build_recommendations(profile, result)
+            for profile, result in zip(user_profiles, ml_results)
+        ]
+    
+    def build_recommendations(self, user_profile, ml_results):
+        """Assemble the recommendation list and summary from ML predictions"""
         expected_return = ml_results['expected_return']
         surplus = user_profile['avg_monthly_income'] - user_profile['monthly_expenses']
         
+        with stage_metrics.stage('recommendations'):
+            recommendations = self.recommendation_items(user_profile, ml_results, surplus)
+        
+        # Generate ML-powered summary
+        with stage_metrics.stage('summary'):
+            summary = self.generate_ml_summary(recommendations, surplus, expected_return, ml_results)
+        
+        return {
+            'status': 'success',
+            'total_surplus': surplus,
+            'recommendations': recommendations,
+            'summary': summary,
+            'ml_metadata': {
+                'model_used': 'ML-Powered',
+                'prediction_date': ml_results['prediction_date'],
+                'expected_portfolio_return': expected_return,
+                'overall_confidence': np.mean(list(ml_results['confidence_scores'].values())),
+                'training_date': self.metadata.get('training_date', 'Unknown'),
+                'training_samples': self.metadata.get('training_samples', 0)
+            }
+        }
+    
+    def recommendation_items(self, user_profile, ml_results, surplus):
+        """Recommendation list for every asset class the ML allocation funds"""
+        allocations = ml_results['allocations']
         recommendations = []
         priority = 1
         
@@ -286,23 +588,7 @@ class MLInvestmentPredictor:
             })
             priority += 1
         
-        # Generate ML-powered summary
-        summary = self.generate_ml_summary(recommendations, surplus, expected_return, ml_results)
-        
-        return {
-            'status': 'success',
-            'total_surplus': surplus,
-            'recommendations': recommendations,
-            'summary': summary,
-            'ml_metadata': {
-                'model_used': 'ML-Powered',
-                'prediction_date': ml_results['prediction_date'],
-                'expected_portfolio_return': expected_return,
-                'overall_confidence': np.mean(list(ml_results['confidence_scores'].values())),
-                'training_date': self.metadata.get('training_date', 'Unknown'),
-                'training_samples': self.metadata.get('training_samples', 0)
-            }
-        }
+        return recommendations
     
     def generate_ml_summary(self, recommendations, total_surplus, expected_return, ml_results):
         """Generate AI-powered investment summary"""
@@ -337,7 +623,7 @@ class MLInvestmentPredictor:
     
     def fallback_recommendation(self, user_profile):
         """Fallback rule-based recommendation if ML fails"""
-        print("🔄 Using fallback rule-based recommendation")
+        request_log.info("🔄 Using fallback rule-based recommendation")
         
         income = user_profile.get('avg_monthly_income', 50000)
         expenses = user_profile.get('monthly_expenses', 30000)
@@ -403,15 +689,92 @@ app.config.from_object(Config)
 
 # Initialize ML predictor
 try:
-    ml_predictor = MLInvestmentPredictor()
-    if ml_predictor.ml_available:
-        print("🤖 ML-powered advisor initialized successfully")
+    ml_predictor = MLInvestmentPredictor(lazy=Config.ML_LAZY_LOAD)
+    if ml_predictor.lazy:
+        log.info("⏳ Loading ML models in the background")
+    elif ml_predictor.ml_available:
+        log.info("🤖 ML-powered advisor initialized successfully")
     else:
-        print("📊 Using rule-based recommendations (ML models not available)")
+        log.info("📊 Using rule-based recommendations (ML models not available)")
 except Exception as e:
-    print(f"⚠️ Error initializing ML predictor: {e}")
+    log.exception("⚠️ Error initializing ML predictor: %s", e)
     ml_predictor = None
 
+def load_validated_predictor():
+    """Predictor for the current model files; raises unless it passes a smoke prediction"""
+    predictor = MLInvestmentPredictor()
+    if not predictor.models_loaded:
+        raise ValueError("model files failed to load or do not match feature_names.pkl")
+    predictor.smoke_test()
+    return predictor
+
+def swap_predictor(predictor):
+    """Serve predictor from now on; requests in flight keep the one they started with"""
+    global ml_predictor
+    ml_predictor = predictor
+
+def start_model_reloader(after_swap=None):
+    """
+    Watch the saved models and hot-swap retrained ones
+    
+    after_swap(predictor) runs once a new predictor is being served; run.py
+    uses it in the gunicorn master to re-fork the workers from the new models.
+    """
+    global model_reloader
+    if model_reloader is not None:
+        model_reloader.stop()
+    model_reloader = None
+    if Config.MODEL_RELOAD_INTERVAL > 0:
+        def swap(predictor):
+            swap_predictor(predictor)
+            if after_swap is not None:
+                after_swap(predictor)
+        model_reloader = ModelReloader(
+            MODEL_DIR, load_validated_predictor, swap, Config.MODEL_RELOAD_INTERVAL
+        ).start()
+    return model_reloader
+
+model_reloader = None
+start_model_reloader()
+
+def route_label():
+    # Route pattern, not path, to keep the number of series and span names bounded
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def start_trace():
+    g.trace_span = tracer.start_request(f"{request.method} {route_label()}", request.headers.get('traceparent'))
+
+@app.before_request
+def begin_request_metrics():
+    stage_metrics.begin(route_label())
+
+@app.before_request
+def assign_request_id():
+    # Keep the caller's id (or trace id) so log lines can be matched across services
+    header = request.headers.get('X-Request-ID')
+    span = g.trace_span
+    if not header and span is not None:
+        header = span.trace_id
+    app_logging.set_request_id(app_logging.request_id_from(header))
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers['X-Request-ID'] = app_logging.get_request_id() or ''
+    span = g.get('trace_span')
+    if span is not None:
+        response.headers['X-Trace-ID'] = span.trace_id
+        span.attributes['status'] = response.status_code
+    return response
+
+@app.teardown_request
+def end_request_metrics(error=None):
+    stage_metrics.end()
+    app_logging.set_request_id(None)
+    span = g.pop('trace_span', None)
+    if span is not None:
+        tracer.finish_request(span, **({'error': type(error).__name__} if error is not None else {}))
+
 @app.route('/')
 def index():
     """Main page with investment calculator"""
@@ -470,14 +833,15 @@ def get_recommendations():
                                  },
                                  config=Config)
         
-        print(f"Processing investment recommendation for surplus: ₹{surplus:,}")
+        request_log.info("Processing investment recommendation for surplus: ₹%s", f"{surplus:,}")
         
         # Generate recommendations using ML or fallback
-        if ml_predictor and ml_predictor.ml_available:
-            recommendations = ml_predictor.generate_ml_recommendations(user_profile)
+        predictor = ml_predictor
+        if predictor and predictor.ml_available:
+            recommendations = predictor.recommend(user_profile)
         else:
             # Fallback logic
-            recommendations = ml_predictor.fallback_recommendation(user_profile) if ml_predictor else {
+            recommendations = predictor.fallback_recommendation(user_profile) if predictor else {
                 'status': 'error',
                 'message': 'Recommendation system unavailable'
             }
@@ -485,21 +849,31 @@ def get_recommendations():
         # Add user profile for display
         recommendations['user_profile'] = user_profile
         
-        print(f"Generated {len(recommendations.get('recommendations', []))} investment recommendations")
+        request_log.info("Generated %d investment recommendations", len(recommendations.get('recommendations', [])))
         
-        return render_template('recommendations.html', 
-                             data=recommendations, 
-                             config=Config)
+        with stage_metrics.stage('render'):
+            return render_template('recommendations.html', 
+                                 data=recommendations, 
+                                 config=Config)
         
     except ValueError as e:
         flash('Please enter valid numeric values for all fields', 'error')
         return redirect(url_for('index'))
     except Exception as e:
-        print(f"Error generating recommendations: {e}")
-        traceback.print_exc()
+        request_log.exception("Error generating recommendations: %s", e)
         flash(f'An error occurred while processing your request. Please try again.', 'error')
         return redirect(url_for('index'))
 
+def api_user_profile(data):
+    """User profile from an API request body"""
+    return {
+        'avg_monthly_income': int(data.get('monthly_income', 0)),
+        'monthly_expenses': int(data.get('monthly_expenses', 0)),
+        'age': int(data.get('age', 25)),
+        'dependents': int(data.get('dependents', 0)),
+        'income_stability': int(data.get('income_stability', 3))
+    }
+
 @app.route('/api/recommendations', methods=['POST'])
 def api_recommendations():
     """API endpoint for getting recommendations"""
@@ -512,13 +886,7 @@ def api_recommendations():
                 'message': 'No data provided'
             }), 400
         
-        user_profile = {
-            'avg_monthly_income': int(data.get('monthly_income', 0)),
-            'monthly_expenses': int(data.get('monthly_expenses', 0)),
-            'age': int(data.get('age', 25)),
-            'dependents': int(data.get('dependents', 0)),
-            'income_stability': int(data.get('income_stability', 3))
-        }
+        user_profile = api_user_profile(data)
         
         if user_profile['avg_monthly_income'] <= 0:
             return jsonify({
@@ -527,8 +895,9 @@ def api_recommendations():
             }), 400
         
         # Generate recommendations
-        if ml_predictor and ml_predictor.ml_available:
-            recommendations = ml_predictor.generate_ml_recommendations(user_profile)
+        predictor = ml_predictor
+        if predictor and predictor.ml_available:
+            recommendations = predictor.recommend(user_profile)
         else:
             recommendations = {'status': 'error', 'message': 'ML models not available'}
         
@@ -543,6 +912,65 @@ def api_recommendations():
             'message': f'Server error: {str(e)}'
         }), 500
 
+@app.route('/api/recommendations/batch', methods=['POST'])
+def api_recommendations_batch():
+    """
+    API endpoint for recommendations for many profiles in one call
+    
+    Accepts a JSON list of profiles (same fields as /api/recommendations) or
+    {"profiles": [...]}. All profiles are scored with one batched prediction;
+    results come back in request order.
+    """
+    try:
+        data = request.get_json(silent=True)
+        profiles = data.get('profiles') if isinstance(data, dict) else data
+        
+        if not profiles or not isinstance(profiles, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'Provide a non-empty list of profiles'
+            }), 400
+        
+        if len(profiles) > Config.MAX_BATCH_PROFILES:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {Config.MAX_BATCH_PROFILES} profiles per batch'
+            }), 413
+        
+        user_profiles = []
+        for index, item in enumerate(profiles):
+            try:
+                user_profile = api_user_profile(item)
+            except (AttributeError, TypeError, ValueError):
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Profile {index}: invalid or non-numeric fields'
+                }), 400
+            if user_profile['avg_monthly_income'] <= 0:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Profile {index}: monthly income must be greater than 0'
+                }), 400
+            user_profiles.append(user_profile)
+        
+        predictor = ml_predictor
+        if predictor and predictor.ml_available:
+            recommendations = predictor.generate_ml_recommendations_many(user_profiles)
+        else:
+            recommendations = [{'status': 'error', 'message': 'ML models not available'}] * len(user_profiles)
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(recommendations),
+            'data': recommendations
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Server error: {str(e)}'
+        }), 500
+
 @app.route('/current_rates')
 def current_rates():
     """Display current market rates"""
@@ -621,32 +1049,114 @@ def about():
     """About page"""
     return render_template('about.html')
 
+def is_ready(predictor):
+    """Models loaded (or known to be unavailable) and warmed up"""
+    return predictor is None or predictor.ready.is_set()
+
 @app.route('/health')
 def health():
-    """Health check endpoint"""
-    ml_status = "available" if ml_predictor and ml_predictor.ml_available else "unavailable"
+    """
+    Health check endpoint
+    
+    Never waits for the models: 'live' is always true while the process
+    serves requests, 'ready' only once the models are loaded and warmed up.
+    """
+    predictor = ml_predictor
+    models_loaded = bool(predictor and predictor.models_loaded)
+    if predictor and not predictor.loaded.is_set():
+        ml_status = "loading"
+    else:
+        ml_status = "available" if models_loaded else "unavailable"
     
     return jsonify({
         'status': 'healthy',
+        'live': True,
+        'ready': is_ready(predictor),
         'timestamp': datetime.now().isoformat(),
         'service': 'Simple Investment Advisor',
         'ml_models': ml_status,
+        'startup': predictor.startup_info() if predictor else None,
         'model_info': {
-            'training_date': ml_predictor.metadata.get('training_date') if ml_predictor and ml_predictor.ml_available else None,
-            'training_samples': ml_predictor.metadata.get('training_samples') if ml_predictor and ml_predictor.ml_available else None
-        } if ml_predictor and ml_predictor.ml_available else None
+            'training_date': predictor.metadata.get('training_date'),
+            'training_samples': predictor.metadata.get('training_samples'),
+            'model_version': predictor.model_version
+        } if models_loaded else None,
+        'model_reload': model_reloader.stats() if model_reloader else None,
+        'recommendation_cache': predictor.cache.stats() if predictor else None,
+        'logging': app_logging.stats(),
+        'tracing': tracer.stats()
     })
 
+@app.route('/health/live')
+def health_live():
+    """Liveness probe: the process is up and serving"""
+    return jsonify({'status': 'live'})
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness probe: 503 until the models are loaded and warmed up"""
+    if not is_ready(ml_predictor):
+        return jsonify({'status': 'starting'}), 503
+    return jsonify({'status': 'ready'})
+
+@app.route('/metrics')
+def metrics():
+    """Request and per-stage latency histograms in Prometheus text format"""
+    return Response(stage_metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/debug/profile')
+def debug_profile():
+    """
+    Sample the stacks of this process for ?seconds=N
+    
+    Returns collapsed stacks (text/plain) or, with format=svg, a flame graph.
+    hz sets the sampling rate (default 100); idle=true keeps threads that are
+    only waiting. Under run.py only the worker answering the request is
+    profiled. Disabled (404) unless PROFILER_TOKEN is set.
+    """
+    if not Config.PROFILER_TOKEN:
+        return jsonify({'status': 'error', 'message': 'Profiler disabled'}), 404
+    if not sampling_profiler.token_matches(Config.PROFILER_TOKEN, request.headers.get('Authorization')):
+        return jsonify({'status': 'error', 'message': 'Invalid or missing profiler token'}), 401
+    
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        hz = int(request.args.get('hz', 100))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'seconds and hz must be numbers'}), 400
+    output = request.args.get('format', 'collapsed')
+    if not 0 < seconds <= Config.PROFILER_MAX_SECONDS or not 1 <= hz <= 1000 or output not in ('collapsed', 'svg'):
+        return jsonify({
+            'status': 'error',
+            'message': f'Use 0 < seconds <= {Config.PROFILER_MAX_SECONDS:g}, 1 <= hz <= 1000 and format collapsed or svg'
+        }), 400
+    include_idle = request.args.get('idle', 'false').lower() in ('1', 'true', 'yes')
+    
+    try:
+        stacks, samples = sampling_profiler.profile(seconds, hz, include_idle)
+    except sampling_profiler.ProfileInProgress as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+    log.info("🔬 Profiled for %gs: %d samples, %d distinct stacks", seconds, samples, len(stacks))
+    
+    if output == 'svg':
+        title = f"Investment advisor (pid {os.getpid()}), {seconds:g}s at {hz} Hz"
+        return Response(sampling_profiler.flame_graph_svg(stacks, title), content_type='image/svg+xml')
+    return Response(sampling_profiler.collapsed(stacks), content_type='text/plain; charset=utf-8')
+
 @app.route('/model_info')
 def model_info():
     """Display ML model information"""
-    if not ml_predictor or not ml_predictor.ml_available:
+    predictor = ml_predictor
+    if not predictor or not predictor.ml_available:
         return jsonify({'error': 'ML models not available'}), 404
     
     return jsonify({
-        'model_metadata': ml_predictor.metadata,
-        'feature_names': ml_predictor.feature_names,
-        'model_performance': ml_predictor.metadata.get('model_performance', {}),
+        'model_metadata': predictor.metadata,
+        'feature_names': predictor.feature_names,
+        'model_performance': predictor.metadata.get('model_performance', {}),
+        'model_version': predictor.model_version,
+        'startup': predictor.startup_info(),
+        'model_reload': model_reloader.stats() if model_reloader else None,
         'load_status': 'success'
     })
 
@@ -663,8 +1173,7 @@ def investment_guide(investment_type):
                                option=option,
                                config=Config)
     except Exception as e:
-        print(f"Error rendering investment guide for {investment_type}: {e}")
-        traceback.print_exc()
+        request_log.exception("Error rendering investment guide for %s: %s", investment_type, e)
         flash('Could not open the investment guide. Please try again.', 'error')
         return redirect(url_for('index'))
 
@@ -699,18 +1208,20 @@ def internal_error(error):
 # ... (rest of your app.py code remains exactly the same until line 710)
 
 if __name__ == '__main__':
-    print("🚀 Starting Simple Investment Advisor...")
-    print(f"📂 Current directory: {os.getcwd()}")
+    log.info("🚀 Starting Simple Investment Advisor...")
+    log.info("📂 Current directory: %s", os.getcwd())
     
     # Check for ML models
-    if ml_predictor and ml_predictor.ml_available:
-        print("🤖 ML-powered recommendations enabled")
-        print(f"📊 Model confidence: {ml_predictor.metadata.get('validation_results', {}).get('overall_model_score', 'Unknown')}")
+    if ml_predictor and ml_predictor.lazy:
+        log.info("⏳ ML models load in the background; /health/ready reports when they are warm")
+    elif ml_predictor and ml_predictor.ml_available:
+        log.info("🤖 ML-powered recommendations enabled")
+        log.info("📊 Model confidence: %s", ml_predictor.metadata.get('validation_results', {}).get('overall_model_score', 'Unknown'))
     else:
-        print("📊 Using rule-based recommendations (generate ML models for enhanced features)")
+        log.info("📊 Using rule-based recommendations (generate ML models for enhanced features)")
     
-    print("🌐 Server starting on http://localhost:5000")
-    print("=" * 60)
+    log.info("🌐 Server starting on http://localhost:5000")
+    log.info("💡 Development server; in production start the multi-process launcher: python run.py")
     
     port = int(os.environ.get("PORT", 5000))
     app.run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,178 @@
+# app_logging.py
+"""
+Non-blocking logging for the advisor.
+
+setup_logging() routes the 'advisor' loggers through a bounded queue to a
+background writer thread (logging.handlers.QueueListener), so a request
+only formats its message and enqueues it; stdout I/O happens elsewhere and
+lines from different threads never interleave. When the queue is full,
+records are dropped and counted rather than blocking the request.
+
+Every record carries the current request id (set_request_id(), '-' outside
+requests). Messages logged on the per-request logger REQUEST_LOGGER are
+rate limited per message template: at most rate_limit records per second
+each, and the next one that gets through reports how many were suppressed.
+
+The writer thread does not survive fork(); it is restarted in the child
+automatically, so workers forked by run.py keep logging.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+
+LOGGER = 'advisor'
+REQUEST_LOGGER = 'advisor.requests'
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(message)s'
+
+# Request ids accepted from callers; anything else is replaced
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+_request = threading.local()
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+def request_id_from(header):
+    """The caller's request id if it is safe to log, else a new one"""
+    return header if header and REQUEST_ID_PATTERN.match(header) else new_request_id()
+
+def set_request_id(request_id):
+    _request.id = request_id
+
+def get_request_id():
+    return getattr(_request, 'id', None)
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request id of the thread that logs them"""
+
+    def filter(self, record):
+        record.request_id = getattr(_request, 'id', None) or '-'
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most rate_limit records per second for each message template"""
+
+    def __init__(self, rate_limit):
+        super().__init__()
+        self.rate_limit = rate_limit
+        self._windows = {}  # template -> [window second, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate_limit <= 0:
+            return True
+        second = int(time.monotonic())
+        with self._lock:
+            window = self._windows.get(record.msg)
+            if window is None:
+                window = self._windows[record.msg] = [second, 0, 0]
+            if window[0] != second:
+                window[0] = second
+                window[1] = 0
+            if window[1] >= self.rate_limit:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Blocks while the queue is full; the writer thread is draining it
+        self.queue.put(self._sentinel)
+
+_handler = None
+_listener = None
+_writer = None
+_queue_size = 10000
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(_queue_size)
+    _listener = _Listener(_handler.queue, _writer, respect_handler_level=True)
+    _listener.start()
+
+def _restart_after_fork():
+    if _handler is not None:
+        _start_listener()
+
+def setup_logging(level='INFO', fmt='text', rate_limit=10, queue_size=10000, stream=None):
+    """Install the queue-backed writer on the 'advisor' loggers; safe to call again"""
+    global _handler, _writer, _queue_size
+    stop_logging()
+    _queue_size = queue_size
+
+    _writer = logging.StreamHandler(stream or sys.stdout)
+    _writer.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    logger = logging.getLogger(LOGGER)
+    if _handler is not None:
+        logger.removeHandler(_handler)
+    _handler = _DroppingQueueHandler(None)
+    _handler.addFilter(RequestIdFilter())
+    logger.addHandler(_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    request_logger = logging.getLogger(REQUEST_LOGGER)
+    request_logger.filters = [f for f in request_logger.filters if not isinstance(f, RateLimitFilter)]
+    request_logger.addFilter(RateLimitFilter(rate_limit))
+
+    _start_listener()
+    return logger
+
+def stop_logging():
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def stats():
+    """Writer state for /health"""
+    return {
+        'queued': _handler.queue.qsize() if _handler is not None else 0,
+        'dropped': _handler.dropped if _handler is not None else 0,
+    }
+
+atexit.register(stop_logging)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,55 @@
+# benchmark_features.py
+"""
+Per-row cost of the shared feature engineering (ml_models/features.py).
+
+Times compute_features() on arrays and profile_features() on the advisor's
+profile dicts for batch sizes from 1 to 1M rows.
+
+Usage:
+    python benchmark_features.py [batch_size ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from ml_models.features import compute_features, profile_features
+
+def make_inputs(n_rows, seed=42):
+    """Random profiles as column arrays and as profile dicts"""
+    rng = np.random.default_rng(seed)
+    income = rng.integers(15000, 200000, n_rows)
+    columns = {
+        'age': rng.integers(22, 65, n_rows),
+        'avg_monthly_income': income,
+        'monthly_expenses': (income * rng.uniform(0.5, 0.95, n_rows)).astype(int),
+        'dependents': rng.integers(0, 4, n_rows),
+        'income_stability': rng.integers(1, 6, n_rows),
+    }
+    profiles = [dict(zip(columns, row)) for row in zip(*(values.tolist() for values in columns.values()))]
+    return columns, profiles
+
+def time_call(func, min_seconds=0.2):
+    """Mean seconds per call, repeating until min_seconds has elapsed"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def run_benchmark(batch_sizes):
+    print(f"{'rows':>10} {'arrays us/row':>14} {'profiles us/row':>16}")
+    for n_rows in batch_sizes:
+        columns, profiles = make_inputs(n_rows)
+        arrays_seconds = time_call(lambda: compute_features(
+            columns['age'], columns['avg_monthly_income'], columns['monthly_expenses'],
+            columns['dependents'], columns['income_stability']
+        ))
+        profiles_seconds = time_call(lambda: profile_features(profiles))
+        print(f"{n_rows:>10,} {arrays_seconds * 1e6 / n_rows:>14.3f} {profiles_seconds * 1e6 / n_rows:>16.3f}")
+
+if __name__ == "__main__":
+    run_benchmark([int(arg) for arg in sys.argv[1:]] or [1, 10, 100, 1000, 10000, 100000, 1000000])
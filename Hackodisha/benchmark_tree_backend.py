@@ -0,0 +1,145 @@
+# benchmark_tree_backend.py
+"""
+Check and benchmark the compiled tree backend (ml_models/tree_compiler.py).
+
+Every model in ml_models.pkl is compiled and compared with sklearn on
+realistic scaled profiles and on random inputs, then compiled again with
+scaler.pkl folded into the thresholds and compared on the same profiles
+unscaled, including rows sitting exactly on (and one ulp above) a folded
+threshold; any difference above the tolerance fails the run (exit code 1).
+Then single-row and batch latency of both backends is reported, along with
+the per-request saving from skipping scaler.transform(). Both use the flat-array walk at every batch
+size (predict_flat), although in serving predict() hands batches of
+SKLEARN_BATCH_ROWS or more back to sklearn.
+
+Usage:
+    python benchmark_tree_backend.py [--tolerance 1e-9] [--rows 20000]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from benchmark_features import make_inputs
+from ml_models.features import profile_features
+from ml_models.tree_compiler import compile_ensemble
+
+# The scaler was fitted on a DataFrame; the checks feed it plain arrays
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_models', 'saved_models')
+
+def load_models():
+    """(name, estimator) for every model in ml_models.pkl, plus the scaler"""
+    models = joblib.load(os.path.join(MODEL_DIR, 'ml_models.pkl'))
+    scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.pkl'))
+    named = [(target, info['model']) for target, info in models.get('portfolio_allocator', {}).items()]
+    if 'return_predictor' in models:
+        named.append(('expected_return', models['return_predictor']['model']))
+    return named, scaler
+
+def time_call(func, min_seconds=0.2):
+    """Mean seconds per call, repeating until min_seconds has elapsed"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def check_parity(named, X, tolerance):
+    """Largest absolute difference per model; False if any exceeds tolerance"""
+    ok = True
+    print(f"{'model':<28} {'algorithm':<26} {'max |diff|':>12}")
+    for name, estimator in named:
+        compiled = compile_ensemble(estimator)
+        diff = np.max(np.abs(compiled.predict_flat(X) - estimator.predict(X)))
+        ok &= diff <= tolerance
+        status = "ok" if diff <= tolerance else "FAIL"
+        print(f"{name:<28} {type(estimator).__name__:<26} {diff:>12.3e} {status}")
+    return ok
+
+def edge_rows(compiled, raw, rng):
+    """raw rows with one feature moved onto a folded threshold, and one ulp above it"""
+    internal = np.flatnonzero(compiled.left != np.arange(len(compiled.left)))
+    nodes = rng.choice(internal, len(raw))
+    rows = np.arange(len(raw))
+    on_threshold = raw.copy()
+    on_threshold[rows, compiled.feature[nodes]] = compiled.threshold[nodes]
+    above = raw.copy()
+    above[rows, compiled.feature[nodes]] = np.nextafter(compiled.threshold[nodes], np.inf)
+    return np.vstack([raw, on_threshold, above])
+
+def check_folded_parity(named, scaler, raw, tolerance):
+    """Folded-scaler models on raw features against sklearn behind the scaler"""
+    ok = True
+    rng = np.random.default_rng(1)
+    print(f"\n{'model (scaler folded)':<28} {'raw rows':>26} {'max |diff|':>12}")
+    for name, estimator in named:
+        compiled = compile_ensemble(estimator, scaler)
+        X = edge_rows(compiled, raw, rng)
+        diff = np.max(np.abs(compiled.predict_flat(X) - estimator.predict(scaler.transform(X))))
+        ok &= diff <= tolerance
+        status = "ok" if diff <= tolerance else "FAIL"
+        print(f"{name:<28} {len(X):>26,} {diff:>12.3e} {status}")
+    return ok
+
+def run_folding_latency(named, scaler, raw):
+    print(f"\n{'rows':>8} {'scale+compiled us/row':>22} {'folded us/row':>14} {'saved us/row':>13}")
+    scaled_models = [compile_ensemble(estimator) for _, estimator in named]
+    folded_models = [compile_ensemble(estimator, scaler) for _, estimator in named]
+    for n_rows in (1, 100):
+        batch = raw[:n_rows]
+        scaled_seconds = time_call(lambda: [model.predict_flat(scaler.transform(batch)) for model in scaled_models])
+        folded_seconds = time_call(lambda: [model.predict_flat(batch) for model in folded_models])
+        print(
+            f"{n_rows:>8,} {scaled_seconds * 1e6 / n_rows:>22.2f} {folded_seconds * 1e6 / n_rows:>14.2f} "
+            f"{(scaled_seconds - folded_seconds) * 1e6 / n_rows:>13.2f}"
+        )
+
+def run_latency(named, X):
+    print(f"\n{'model':<28} {'rows':>8} {'sklearn us/row':>15} {'compiled us/row':>16} {'speedup':>8}")
+    for name, estimator in named:
+        compiled = compile_ensemble(estimator)
+        for n_rows in (1, 100, 10000):
+            batch = X[:n_rows]
+            sklearn_seconds = time_call(lambda: estimator.predict(batch))
+            compiled_seconds = time_call(lambda: compiled.predict_flat(batch))
+            print(
+                f"{name:<28} {n_rows:>8,} {sklearn_seconds * 1e6 / n_rows:>15.2f} "
+                f"{compiled_seconds * 1e6 / n_rows:>16.2f} {sklearn_seconds / compiled_seconds:>7.1f}x"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the compiled tree backend")
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--rows', type=int, default=20000, help="rows used for the parity check")
+    args = parser.parse_args()
+
+    named, scaler = load_models()
+    _, profiles = make_inputs(args.rows)
+    raw = profile_features(profiles)
+    realistic = scaler.transform(raw)
+    # Wide random inputs reach splits and leaves realistic profiles never touch
+    rng = np.random.default_rng(0)
+    wide = rng.normal(0, 3, realistic.shape)
+    X = np.vstack([realistic, wide])
+
+    ok = check_parity(named, X, args.tolerance)
+    ok &= check_folded_parity(named, scaler, raw, args.tolerance)
+    run_latency(named, realistic)
+    run_folding_latency(named, scaler, raw)
+    if not ok:
+        print(f"\n❌ Compiled predictions differ from sklearn by more than {args.tolerance:g}")
+        return 1
+    print(f"\n✅ Compiled predictions match sklearn within {args.tolerance:g}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# build_allocation_grid.py
+"""
+Precompute the allocation grid used when USE_ALLOCATION_GRID is enabled.
+
+Evaluates the current models over a grid of (age, dependents, income
+stability, monthly income, monthly expenses) and writes
+ml_models/saved_models/allocation_grid.<id>.npy plus the .json description
+naming it (see ml_models/allocation_grid.py). Then reports the interpolation error
+against live predictions on random in-grid profiles and the latency of
+both paths.
+
+Usage:
+    python build_allocation_grid.py
+    python build_allocation_grid.py --income 10000 300000 2500 --expenses 0 300000 2500
+    python build_allocation_grid.py --report-only
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from ml_models.allocation_grid import DEFAULT_AXES, AllocationGrid, build_grid
+from ml_models.features import profile_features
+
+# The scaler was fitted on a DataFrame; the grid feeds it plain arrays
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_models', 'saved_models')
+
+def random_profiles(grid, n_profiles, seed=0):
+    """Profiles drawn uniformly inside the grid, off the income/expense grid points"""
+    rng = np.random.default_rng(seed)
+    draw = lambda name: rng.integers(grid.axes[name][0], grid.axes[name][1] + 1, n_profiles)
+    income = rng.uniform(grid.axes['monthly_income'][0], grid.axes['monthly_income'][1], n_profiles).astype(int)
+    expenses = rng.uniform(grid.axes['monthly_expenses'][0], grid.axes['monthly_expenses'][1], n_profiles).astype(int)
+    return [
+        {'age': int(a), 'dependents': int(d), 'income_stability': int(s),
+         'avg_monthly_income': int(i), 'monthly_expenses': int(e)}
+        for a, d, s, i, e in zip(draw('age'), draw('dependents'), draw('income_stability'), income, expenses)
+    ]
+
+def time_call(func, min_seconds=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def report(predictor, grid, n_profiles):
+    """Interpolation error versus live inference, and latency of both paths"""
+    profiles = random_profiles(grid, n_profiles)
+    features = profile_features(profiles)
+    in_grid, grid_allocations, grid_returns = grid.lookup_many(features)
+    _, live_allocations, live_returns, _ = predictor.allocation_arrays(features)
+    assert in_grid.all()
+
+    print(f"\n📏 Grid vs live inference on {n_profiles:,} random in-grid profiles")
+    print(f"   {'output':<28} {'max |err|':>10} {'p99 |err|':>10} {'mean |err|':>11}")
+    errors = np.abs(np.column_stack([grid_allocations, grid_returns]) - np.column_stack([live_allocations, live_returns]))
+    for i, name in enumerate(grid.targets + ['expected_return']):
+        column = errors[:, i]
+        print(f"   {name:<28} {column.max():>10.4f} {np.percentile(column, 99):>10.4f} {column.mean():>11.5f}")
+    within = (errors[:, :-1].max(axis=1) <= 0.01).mean()
+    print(f"   Profiles with every allocation within 1 percentage point: {within:.1%}")
+
+    print(f"\n⏱️ Latency")
+    print(f"   {'rows':>7} {'live ms':>9} {'grid ms':>9} {'speedup':>8}")
+    for n_rows in (1, 100, 10000):
+        batch = features[:n_rows]
+        live_seconds = time_call(lambda: predictor.allocation_arrays(batch))
+        grid_seconds = time_call(lambda: grid.lookup_many(batch))
+        print(f"   {n_rows:>7,} {live_seconds * 1e3:>9.3f} {grid_seconds * 1e3:>9.3f} {live_seconds / grid_seconds:>7.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the allocation grid for the current models")
+    for name, flag in (('age', '--age'), ('dependents', '--dependents'), ('income_stability', '--stability'),
+                       ('monthly_income', '--income'), ('monthly_expenses', '--expenses')):
+        parser.add_argument(flag, dest=name, type=int, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                            default=DEFAULT_AXES[name], help=f"grid axis (default: {DEFAULT_AXES[name]})")
+    parser.add_argument('--samples', type=int, default=20000, help="profiles used for the error report")
+    parser.add_argument('--report-only', action='store_true', help="skip building, report on the existing grid")
+    args = parser.parse_args()
+
+    # Importing the app loads the models exactly as the service does
+    from app import ml_predictor
+    if ml_predictor is None or not ml_predictor.ml_available:
+        print("❌ ML models are not available; generate them first")
+        return 1
+
+    if not args.report_only:
+        axes = {name: tuple(getattr(args, name)) for name in DEFAULT_AXES}
+        print(f"🗺️ Building allocation grid for models {ml_predictor.model_version}...")
+        start = time.perf_counter()
+        path = build_grid(ml_predictor.allocation_arrays, MODEL_DIR,
+                          ml_predictor.model_version, axes)
+        print(f"✅ Grid saved: {path} ({os.path.getsize(path) / 1e6:.1f} MB, "
+              f"{time.perf_counter() - start:.0f}s)")
+
+    grid = AllocationGrid.load(MODEL_DIR)
+    if grid is None or grid.model_version != ml_predictor.model_version:
+        print("❌ No allocation grid for the current models")
+        return 1
+    report(ml_predictor, grid, args.samples)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
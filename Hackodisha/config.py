@@ -3,6 +3,61 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
+    # Largest number of profiles accepted by /api/recommendations/batch
+    MAX_BATCH_PROFILES = int(os.environ.get('MAX_BATCH_PROFILES', 10000))
+    
+    # How tree models are evaluated: 'compiled' (flat NumPy arrays), 'sklearn'
+    # or 'onnx' (onnxruntime on ml_models.onnx from export_onnx.py)
+    ML_INFERENCE_BACKEND = os.environ.get('ML_INFERENCE_BACKEND', 'compiled')
+    
+    # Threads per onnxruntime call; keep at 1 when running several workers
+    ONNX_THREADS = int(os.environ.get('ONNX_THREADS', 1))
+    
+    # Recommendation result cache (entries, seconds); size 0 disables it
+    RECOMMENDATION_CACHE_SIZE = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 1024))
+    RECOMMENDATION_CACHE_TTL = float(os.environ.get('RECOMMENDATION_CACHE_TTL', 300))
+    
+    # Answer from the precomputed allocation grid (build_allocation_grid.py) when it matches the models
+    USE_ALLOCATION_GRID = os.environ.get('USE_ALLOCATION_GRID', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Load the models in a background thread (memory-mapped) and warm them up,
+    # so the server starts at once; /health/ready turns 200 when they are warm
+    ML_LAZY_LOAD = os.environ.get('ML_LAZY_LOAD', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Longest a request waits for models still loading before using the rule-based fallback
+    ML_LOAD_WAIT_SECONDS = float(os.environ.get('ML_LOAD_WAIT_SECONDS', 30))
+    
+    # Seconds between checks of ml_models/saved_models for retrained models; 0 disables hot reload
+    MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 10))
+    
+    # Fraction of requests whose stages are timed for /metrics (0 disables the timers)
+    METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+    
+    # Logging: level, 'text' or 'json' lines, per-request messages allowed per
+    # second for each message, and records buffered for the writer thread
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT', 10))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    
+    # /debug/profile is enabled only when a token is set; requests must send
+    # "Authorization: Bearer <token>". Keep the longest profile below run.py's
+    # --timeout, which restarts sync workers busy for longer
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+    PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', 25))
+    
+    # Request tracing: spans are appended to files in TRACE_DIR (disabled when
+    # empty) for trace_report.py; requests without an upstream traceparent are
+    # traced at TRACE_SAMPLE_RATE
+    TRACE_DIR = os.environ.get('TRACE_DIR', '')
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+    
+    # Production launcher (run.py): worker processes, threads per worker and
+    # BLAS/OpenMP threads per worker (1 avoids oversubscribing the CPUs)
+    WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    WORKER_BLAS_THREADS = int(os.environ.get('WORKER_BLAS_THREADS', 1))
+    
     # Investment options for low-income users (English)
     INVESTMENT_OPTIONS = {
         'emergency_fund': {
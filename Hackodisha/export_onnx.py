@@ -0,0 +1,116 @@
+# export_onnx.py
+"""
+Export ml_models.pkl with scaler.pkl fused in to ml_models.onnx, then check
+and benchmark it.
+
+Parity: every output column of the ONNX graph is compared with the sklearn
+predictions (scaler.transform + estimator.predict) on realistic profiles
+and on random profiles; any difference above the tolerance fails the run
+(exit code 1). ONNX tree ensembles work in float32, hence the default
+tolerance of 1e-4 instead of the compiled backend's 1e-9.
+
+Throughput: all models for a batch of raw feature rows with sklearn, the
+compiled backend and onnxruntime (one call for every model).
+
+Needs the onnx, skl2onnx and onnxruntime packages.
+
+Usage:
+    python export_onnx.py [--tolerance 1e-4] [--rows 20000] [--check-only]
+"""
+import argparse
+import os
+import sys
+import warnings
+
+import joblib
+import numpy as np
+
+from benchmark_features import make_inputs, time_call
+from ml_models.features import compute_features, profile_features
+from ml_models.onnx_backend import ONNX_FILE, OnnxAllocationModel, export_onnx, model_groups
+from ml_models.tree_compiler import compile_ensemble
+
+# The scaler was fitted on a DataFrame; the checks feed it plain arrays
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_models', 'saved_models')
+MODELS_FILE = os.path.join(MODEL_DIR, 'ml_models.pkl')
+SCALER_FILE = os.path.join(MODEL_DIR, 'scaler.pkl')
+ONNX_PATH = os.path.join(MODEL_DIR, ONNX_FILE)
+
+def predict_all(groups, scaler, features):
+    """Every output column for raw feature rows, one estimator call per model"""
+    features_scaled = scaler.transform(features)
+    return np.column_stack([
+        np.asarray(estimator.predict(features_scaled)).reshape(len(features), -1)
+        for _, estimator, _ in groups
+    ])
+
+def random_features(n_rows, seed=1):
+    """Profiles over the full input domain, beyond the training distribution"""
+    rng = np.random.default_rng(seed)
+    return compute_features(
+        rng.integers(18, 71, n_rows), rng.integers(0, 400000, n_rows), rng.integers(0, 400000, n_rows),
+        rng.integers(0, 6, n_rows), rng.integers(1, 6, n_rows)
+    )
+
+def check_parity(onnx_model, groups, scaler, features, tolerance):
+    """Largest absolute difference per output column; False if any exceeds tolerance"""
+    expected = predict_all(groups, scaler, features)
+    actual = onnx_model.predict(features)
+    diffs = np.max(np.abs(actual - expected), axis=0)
+    print(f"   {'output':<28} {'max |diff|':>12}")
+    for column, diff in zip(onnx_model.columns, diffs):
+        print(f"   {column:<28} {diff:>12.3e} {'ok' if diff <= tolerance else 'FAIL'}")
+    return bool(np.all(diffs <= tolerance))
+
+def run_throughput(onnx_model, groups, scaler, features):
+    compiled = [(name, compile_ensemble(estimator), columns) for name, estimator, columns in groups]
+    backends = [
+        ('sklearn', lambda batch: predict_all(groups, scaler, batch)),
+        ('compiled', lambda batch: predict_all(compiled, scaler, batch)),
+        ('onnx', onnx_model.predict),
+    ]
+    print(f"\n⏱️ All {len(groups)} model(s) per call, raw features in")
+    print(f"   {'rows':>7} " + " ".join(f"{name + ' rows/s':>16}" for name, _ in backends) + f" {'onnx vs sklearn':>16}")
+    for n_rows in (1, 100, 10000):
+        batch = features[:n_rows]
+        seconds = [time_call(lambda: predict(batch)) for _, predict in backends]
+        print(f"   {n_rows:>7,} " + " ".join(f"{n_rows / s:>16,.0f}" for s in seconds)
+              + f" {seconds[0] / seconds[2]:>15.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the models to ONNX and check parity with sklearn")
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    parser.add_argument('--rows', type=int, default=20000, help="rows used for the parity check")
+    parser.add_argument('--check-only', action='store_true', help="check the existing ml_models.onnx")
+    args = parser.parse_args()
+
+    models = joblib.load(MODELS_FILE)
+    scaler = joblib.load(SCALER_FILE)
+    groups = model_groups(models)
+
+    if not args.check_only:
+        print("📦 Exporting ml_models.pkl + scaler.pkl to ONNX...")
+        export_onnx(models, scaler, ONNX_PATH, MODELS_FILE, SCALER_FILE)
+        print(f"✅ {ONNX_PATH} saved ({os.path.getsize(ONNX_PATH) / 1e6:.1f} MB)")
+
+    onnx_model = OnnxAllocationModel(ONNX_PATH)
+    if not onnx_model.matches(MODELS_FILE, SCALER_FILE):
+        print("❌ ml_models.onnx was exported from different pickles")
+        return 1
+
+    _, profiles = make_inputs(args.rows, seed=0)
+    realistic = profile_features(profiles)
+    ok = True
+    for label, features in (("realistic", realistic), ("random", random_features(args.rows))):
+        print(f"\n🔍 Parity with sklearn on {args.rows:,} {label} profiles (tolerance {args.tolerance:g})")
+        ok &= check_parity(onnx_model, groups, scaler, features, args.tolerance)
+
+    run_throughput(onnx_model, groups, scaler, realistic)
+
+    print("\n✅ ONNX export matches sklearn" if ok else "\n❌ ONNX export differs from sklearn")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@ def run_all_generators():
         'generate_ml_models.py',
         'generate_scaler.py', 
         'generate_feature_names.py',
-        'generate_metadata.py'
+        'generate_metadata.py',
+        'export_onnx.py'
     ]
     
     print("🚀 Generating all pickle files...")
@@ -2,6 +2,8 @@
 import joblib
 import os
 
+from ml_models.features import FEATURE_NAMES
+
 def create_feature_names():
     """Generate and save feature_names.pkl"""
     print("📝 Creating feature_names.pkl...")
@@ -9,25 +11,8 @@ def create_feature_names():
     # Create directories
     os.makedirs('ml_models/saved_models', exist_ok=True)
     
-    # Define comprehensive feature names
-    feature_names = [
-        # Basic demographic features
-        'age',
-        'monthly_income', 
-        'monthly_expenses',
-        'surplus',
-        'dependents',
-        'income_stability',
-        
-        # Calculated ratio features
-        'surplus_to_income_ratio',
-        'expense_ratio',
-        'risk_capacity',
-        
-        # Interaction features
-        'age_income_interaction',
-        'stability_surplus_interaction'
-    ]
+    # Feature order comes from the shared feature module used in training and serving
+    feature_names = list(FEATURE_NAMES)
     
     print(f"📋 Feature names ({len(feature_names)} total):")
     for i, name in enumerate(feature_names, 1):
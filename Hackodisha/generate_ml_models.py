@@ -1,102 +1,85 @@
 # generate_ml_models.py
+import argparse
+import time
+
 import numpy as np
 import pandas as pd
 import joblib
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, cross_val_predict, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import r2_score, mean_absolute_error
 import os
 
-def create_ml_models():
-    """Generate and save ml_models.pkl"""
+from ml_models.features import FEATURE_NAMES, compute_features
+from ml_models.onnx_backend import ONNX_FILE, export_onnx
+from ml_models.tree_compiler import compile_ensemble
+
+ALLOCATION_TARGETS = ['emergency_fund_allocation', 'equity_allocation', 'debt_allocation', 'gold_allocation']
+TARGET_COLUMNS = ALLOCATION_TARGETS + ['expected_return']
+
+def generate_training_data(n_samples=5000):
+    """Synthetic investor profiles with features and allocation/return targets"""
+    print("📊 Generating training data...")
+    age = np.random.randint(25, 60, n_samples)
+    income = np.random.randint(30000, 150000, n_samples)
+    expenses = (income * np.random.uniform(0.6, 0.85, n_samples)).astype(int)
+    dependents = np.random.choice([0, 1, 2, 3], n_samples, p=[0.3, 0.4, 0.2, 0.1])
+    stability = np.random.choice([1, 2, 3, 4, 5], n_samples, p=[0.1, 0.2, 0.4, 0.2, 0.1])
+    
+    # Calculate features exactly as the advisor does at prediction time
+    df = pd.DataFrame(compute_features(age, income, expenses, dependents, stability), columns=FEATURE_NAMES)
+    risk_capacity = df['risk_capacity'].to_numpy()
+    
+    # Generate realistic allocations based on risk
+    # (emergency, equity, debt, gold) for conservative, moderate and aggressive profiles
+    base_allocations = np.array([
+        [0.35, 0.25, 0.3, 0.1],
+        [0.3, 0.45, 0.2, 0.05],
+        [0.25, 0.6, 0.1, 0.05],
+    ])
+    risk_profile = np.select([risk_capacity <= 3, risk_capacity <= 7], [0, 1], default=2)
+    allocations = base_allocations[risk_profile]
+    
+    # Add some randomness
+    allocations += np.column_stack([
+        np.random.uniform(-0.05, 0.05, n_samples),
+        np.random.uniform(-0.1, 0.1, n_samples),
+        np.random.uniform(-0.05, 0.05, n_samples),
+        np.random.uniform(-0.02, 0.02, n_samples),
+    ])
+    
+    # Normalize
+    allocations /= allocations.sum(axis=1, keepdims=True)
+    
+    df[ALLOCATION_TARGETS] = allocations
+    
+    # Expected return
+    df['expected_return'] = allocations @ np.array([4, 12, 7, 8])
+    
+    return df
+
+def create_ml_models(multi_output=False, include_return=False, compare=False):
+    """
+    Generate and save ml_models.pkl
+    
+    By default one model is trained per allocation target plus a return
+    predictor. With multi_output=True a single multi-output RandomForest
+    predicts all allocation targets (and expected_return too when
+    include_return=True), flagged in the artifact so the advisor makes one
+    call per request. compare=True trains both setups on the same data and
+    prints an accuracy and latency report before saving.
+    """
     print("🤖 Creating ml_models.pkl...")
     
     # Create directories
     os.makedirs('ml_models/saved_models', exist_ok=True)
     
-    # Generate sample training data
-    print("📊 Generating training data...")
-    n_samples = 5000
-    data = []
-    
-    for i in range(n_samples):
-        age = np.random.randint(25, 60)
-        income = np.random.randint(30000, 150000)
-        expenses = int(income * np.random.uniform(0.6, 0.85))
-        surplus = income - expenses
-        dependents = np.random.choice([0, 1, 2, 3], p=[0.3, 0.4, 0.2, 0.1])
-        stability = np.random.choice([1, 2, 3, 4, 5], p=[0.1, 0.2, 0.4, 0.2, 0.1])
-        
-        # Calculate features
-        surplus_ratio = surplus / income if income > 0 else 0
-        risk_capacity = min(10, max(1, 5 + (stability - 3) + (60 - age) // 10 - dependents))
-        
-        # Generate realistic allocations based on risk
-        if risk_capacity <= 3:  # Conservative
-            emergency = 0.35
-            equity = 0.25
-            debt = 0.3
-            gold = 0.1
-        elif risk_capacity <= 7:  # Moderate
-            emergency = 0.3
-            equity = 0.45
-            debt = 0.2
-            gold = 0.05
-        else:  # Aggressive
-            emergency = 0.25
-            equity = 0.6
-            debt = 0.1
-            gold = 0.05
-        
-        # Add some randomness
-        emergency += np.random.uniform(-0.05, 0.05)
-        equity += np.random.uniform(-0.1, 0.1)
-        debt += np.random.uniform(-0.05, 0.05)
-        gold += np.random.uniform(-0.02, 0.02)
-        
-        # Normalize
-        total = emergency + equity + debt + gold
-        emergency, equity, debt, gold = [x/total for x in [emergency, equity, debt, gold]]
-        
-        # Expected return
-        expected_return = emergency * 4 + equity * 12 + debt * 7 + gold * 8
-        
-        data.append({
-            'age': age,
-            'monthly_income': income,
-            'monthly_expenses': expenses,
-            'surplus': surplus,
-            'dependents': dependents,
-            'income_stability': stability,
-            'surplus_to_income_ratio': surplus_ratio,
-            'expense_ratio': expenses / income,
-            'risk_capacity': risk_capacity,
-            'age_income_interaction': age * income / 100000,
-            'stability_surplus_interaction': stability * surplus / 1000,
-            'emergency_fund_allocation': emergency,
-            'equity_allocation': equity,
-            'debt_allocation': debt,
-            'gold_allocation': gold,
-            'expected_return': expected_return
-        })
-    
-    df = pd.DataFrame(data)
+    df = generate_training_data()
     
     # Prepare features and targets
-    feature_cols = [
-        'age', 'monthly_income', 'monthly_expenses', 'surplus', 'dependents',
-        'income_stability', 'surplus_to_income_ratio', 'expense_ratio', 
-        'risk_capacity', 'age_income_interaction', 'stability_surplus_interaction'
-    ]
-    
-    target_cols = [
-        'emergency_fund_allocation', 'equity_allocation', 'debt_allocation', 
-        'gold_allocation', 'expected_return'
-    ]
-    
-    X = df[feature_cols]
-    y = df[target_cols]
+    X = df[FEATURE_NAMES]
+    y = df[TARGET_COLUMNS]
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -107,13 +90,47 @@ def create_ml_models():
     X_test_scaled = scaler.transform(X_test)
     
     print("🎯 Training ML models...")
+    if multi_output or compare:
+        multi_models = train_multi_output_model(X_train_scaled, X_test_scaled, y_train, y_test, include_return)
+    if not multi_output or compare:
+        per_target_models = train_per_target_models(X_train_scaled, X_test_scaled, y_train, y_test)
+    if compare:
+        compare_setups(per_target_models, multi_models, X_test_scaled, y_test)
+    models = multi_models if multi_output else per_target_models
+    
+    # Save models
+    joblib.dump(models, 'ml_models/saved_models/ml_models.pkl')
+    print("✅ ml_models.pkl saved!")
+    
+    # Test loading
+    loaded_models = joblib.load('ml_models/saved_models/ml_models.pkl')
+    print(f"✅ Verified: Contains {len(loaded_models)} model groups")
+    
+    export_models_onnx(models)
+    
+    return models
+
+def export_models_onnx(models):
+    """Also save ml_models.onnx, with the served scaler.pkl fused in"""
+    scaler_file = 'ml_models/saved_models/scaler.pkl'
+    if not os.path.exists(scaler_file):
+        print("⚠️ Skipping ONNX export: no scaler.pkl yet (run export_onnx.py once it exists)")
+        return
+    try:
+        export_onnx(models, joblib.load(scaler_file), f'ml_models/saved_models/{ONNX_FILE}',
+                    'ml_models/saved_models/ml_models.pkl', scaler_file)
+        print(f"✅ {ONNX_FILE} saved! (check parity with export_onnx.py --check-only)")
+    except ImportError as e:
+        print(f"⚠️ Skipping ONNX export: {e}")
+
+def train_per_target_models(X_train_scaled, X_test_scaled, y_train, y_test):
+    """One model per allocation target plus a return predictor (best of RF/GB each)"""
     models = {}
     
     # Train portfolio allocation models
     portfolio_models = {}
-    allocation_targets = ['emergency_fund_allocation', 'equity_allocation', 'debt_allocation', 'gold_allocation']
     
-    for target in allocation_targets:
+    for target in ALLOCATION_TARGETS:
         print(f"   Training {target} model...")
         
         # Try different models
@@ -188,16 +205,133 @@ def create_ml_models():
     
     print(f"     ✅ {best_return_name} - CV: {best_return_score:.4f}, Test R²: {return_test_r2:.4f}")
     
-    # Save models
-    joblib.dump(models, 'ml_models/saved_models/ml_models.pkl')
-    print("✅ ml_models.pkl saved!")
+    return models
+
+def train_multi_output_model(X_train_scaled, X_test_scaled, y_train, y_test, include_return=False):
+    """A single RandomForest predicting every allocation target (and optionally the return)"""
+    targets = TARGET_COLUMNS if include_return else ALLOCATION_TARGETS
+    print(f"   Training multi-output model for {len(targets)} targets...")
     
-    # Test loading
-    loaded_models = joblib.load('ml_models/saved_models/ml_models.pkl')
-    print(f"✅ Verified: Contains {len(loaded_models)} model groups")
+    model = RandomForestRegressor(n_estimators=150, max_depth=12, random_state=42)
+    
+    # Per-target cross-validated R² (one set of folds for all targets)
+    cv_pred = cross_val_predict(model, X_train_scaled, y_train[targets], cv=5)
+    target_cv_scores = dict(zip(targets, r2_score(y_train[targets], cv_pred, multioutput='raw_values')))
+    
+    model.fit(X_train_scaled, y_train[targets])
+    
+    # Test performance
+    y_pred = model.predict(X_test_scaled)
+    target_scores = {
+        target: {
+            'test_r2': r2_score(y_test[target], y_pred[:, i]),
+            'test_mae': mean_absolute_error(y_test[target], y_pred[:, i])
+        }
+        for i, target in enumerate(targets)
+    }
+    cv_score = float(np.mean(list(target_cv_scores.values())))
+    
+    for target in targets:
+        print(f"     ✅ {target} - CV: {target_cv_scores[target]:.4f}, Test R²: {target_scores[target]['test_r2']:.4f}")
+    
+    models = {
+        'multi_output': True,
+        'allocation_model': {
+            'model': model,
+            'algorithm': 'RandomForest (multi-output)',
+            'targets': targets,
+            'cv_score': cv_score,
+            'target_cv_scores': target_cv_scores,
+            'target_scores': target_scores
+        }
+    }
+    
+    if not include_return:
+        # Expected return still comes from its own model
+        print("   Training return predictor...")
+        return_model = RandomForestRegressor(n_estimators=150, max_depth=12, random_state=42)
+        return_score = cross_val_score(return_model, X_train_scaled, y_train['expected_return'], cv=5, scoring='r2').mean()
+        return_model.fit(X_train_scaled, y_train['expected_return'])
+        y_return_pred = return_model.predict(X_test_scaled)
+        models['return_predictor'] = {
+            'model': return_model,
+            'algorithm': 'RandomForest',
+            'cv_score': return_score,
+            'test_r2': r2_score(y_test['expected_return'], y_return_pred),
+            'test_mae': mean_absolute_error(y_test['expected_return'], y_return_pred)
+        }
+        print(f"     ✅ RandomForest - CV: {return_score:.4f}, Test R²: {models['return_predictor']['test_r2']:.4f}")
     
     return models
 
+def prediction_calls(models):
+    """(estimator, output targets) for every call one request makes"""
+    if models.get('multi_output'):
+        calls = [(models['allocation_model']['model'], models['allocation_model']['targets'])]
+    else:
+        calls = [(info['model'], [target]) for target, info in models['portfolio_allocator'].items()]
+    if 'return_predictor' in models:
+        calls.append((models['return_predictor']['model'], ['expected_return']))
+    return calls
+
+def node_count(estimator):
+    """Total tree nodes held by a tree ensemble"""
+    trees = np.ravel(getattr(estimator, 'estimators_', [estimator]))
+    return sum(tree.tree_.node_count for tree in trees)
+
+def time_per_call(func, min_seconds=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def compare_setups(per_target_models, multi_models, X_test_scaled, y_test):
+    """Print accuracy and latency of the per-target and multi-output setups"""
+    setups = {'per-target': per_target_models, 'multi-output': multi_models}
+    
+    print("\n📋 Per-target vs multi-output comparison (held-out test set)")
+    print(f"   {'target':<28} {'per-target R²':>14} {'multi R²':>10} {'per-target MAE':>15} {'multi MAE':>10}")
+    predictions = {}
+    for name, models in setups.items():
+        predictions[name] = {}
+        for estimator, targets in prediction_calls(models):
+            outputs = np.asarray(estimator.predict(X_test_scaled)).reshape(len(X_test_scaled), -1)
+            predictions[name].update(zip(targets, outputs.T))
+    for target in TARGET_COLUMNS:
+        r2 = [r2_score(y_test[target], predictions[name][target]) for name in setups]
+        mae = [mean_absolute_error(y_test[target], predictions[name][target]) for name in setups]
+        print(f"   {target:<28} {r2[0]:>14.4f} {r2[1]:>10.4f} {mae[0]:>15.4f} {mae[1]:>10.4f}")
+    
+    print(f"\n   {'setup':<14} {'backend':<9} {'calls':>6} {'tree nodes':>11} {'1 row ms':>9} {'1000 rows ms':>13}")
+    for name, models in setups.items():
+        calls = prediction_calls(models)
+        nodes = sum(node_count(estimator) for estimator, _ in calls)
+        for backend in ('sklearn', 'compiled'):
+            estimators = [estimator for estimator, _ in calls]
+            if backend == 'compiled':
+                estimators = [compile_ensemble(estimator) for estimator in estimators]
+            timings = []
+            for n_rows in (1, 1000):
+                batch = X_test_scaled[:n_rows]
+                timings.append(time_per_call(lambda: [estimator.predict(batch) for estimator in estimators]))
+            print(f"   {name:<14} {backend:<9} {len(calls):>6} {nodes:>11,} {timings[0] * 1e3:>9.3f} {timings[1] * 1e3:>13.2f}")
+    print()
+
 if __name__ == "__main__":
-    models = create_ml_models()
+    parser = argparse.ArgumentParser(description="Train the investment advisor models and save ml_models.pkl")
+    parser.add_argument('--multi-output', action='store_true',
+                        help="fit one multi-output model for all allocation targets")
+    parser.add_argument('--include-return', action='store_true',
+                        help="with --multi-output, predict expected_return from the same model")
+    parser.add_argument('--compare', action='store_true',
+                        help="train both setups and print an accuracy/latency comparison")
+    args = parser.parse_args()
+    if args.include_return and not (args.multi_output or args.compare):
+        parser.error("--include-return only applies to the multi-output model (add --multi-output or --compare)")
+    
+    models = create_ml_models(args.multi_output, args.include_return, args.compare)
     print("🎉 ml_models.pkl generated successfully!")
\ No newline at end of file
@@ -0,0 +1,175 @@
+# allocation_grid.py
+"""
+Precomputed allocation surface.
+
+The models' inputs all derive from five profile values: age, dependents and
+income stability (small integer domains) plus monthly income and expenses.
+build_grid() evaluates the models once over a grid of those values and
+stores the final (clipped, normalized) allocations and expected return in a
+memory-mapped float32 array of shape
+
+    (ages, dependents, stabilities, incomes, expenses, targets + 1)
+
+AllocationGrid answers from it with an exact lookup on the integer axes and
+bilinear interpolation over income and expenses. Profiles outside the grid
+are reported as misses so the caller can fall back to live inference.
+
+Each build writes a new allocation_grid.<id>.npy and then atomically
+replaces META_FILE, which names it; readers therefore always see a grid
+together with its own description, even while a rebuild is running.
+"""
+import glob
+import json
+import os
+
+import numpy as np
+
+from ml_models.features import FEATURE_NAMES, compute_features
+
+GRID_FILE = 'allocation_grid.npy'  # grids written before META_FILE named its grid
+GRID_PATTERN = 'allocation_grid.*.npy'
+META_FILE = 'allocation_grid.json'
+# In-progress files; must not end in a suffix the model reloader watches
+PARTIAL_SUFFIX = '.partial'
+
+# Default axes: (start, stop, step), stop inclusive
+DEFAULT_AXES = {
+    'age': (18, 70, 1),
+    'dependents': (0, 4, 1),
+    'income_stability': (1, 5, 1),
+    'monthly_income': (10000, 250000, 5000),
+    'monthly_expenses': (0, 250000, 5000),
+}
+
+AXIS_ORDER = ['age', 'dependents', 'income_stability', 'monthly_income', 'monthly_expenses']
+
+def axis_values(start, stop, step):
+    return np.arange(start, stop + step / 2, step, dtype=np.float64)
+
+def build_grid(allocation_arrays, directory, model_version, axes=None, progress=print):
+    """
+    Evaluate the models over the grid and write a grid file plus META_FILE
+
+    allocation_arrays(features) must return (targets, allocations,
+    expected_returns, confidence_scores) as MLInvestmentPredictor does.
+    Grids of earlier builds are removed afterwards. Returns the path of the
+    grid array.
+    """
+    axes = {**DEFAULT_AXES, **(axes or {})}
+    values = {name: axis_values(*axes[name]) for name in AXIS_ORDER}
+    ages, dependents, stabilities, incomes, expenses = (values[name] for name in AXIS_ORDER)
+
+    # Every (dependents, stability, income, expenses) combination for one age
+    _, dep_mesh, stab_mesh, inc_mesh, exp_mesh = np.meshgrid(
+        [0], dependents, stabilities, incomes, expenses, indexing='ij'
+    )
+    block_shape = dep_mesh.shape[1:]
+
+    grid_file = f"allocation_grid.{os.urandom(4).hex()}.npy"
+    path = os.path.join(directory, grid_file)
+    tmp_path = path + PARTIAL_SUFFIX
+    grid = None
+    meta = None
+    for i, age in enumerate(ages):
+        features = compute_features(
+            np.full(inc_mesh.size, age), inc_mesh.ravel(), exp_mesh.ravel(), dep_mesh.ravel(), stab_mesh.ravel()
+        )
+        targets, allocations, expected_returns, confidence_scores = allocation_arrays(features)
+        if grid is None:
+            shape = (len(ages),) + block_shape + (len(targets) + 1,)
+            grid = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+            meta = {
+                'model_version': model_version,
+                'grid_file': grid_file,
+                'axes': {name: list(axes[name]) for name in AXIS_ORDER},
+                'targets': targets,
+                'confidence_scores': {target: float(score) for target, score in confidence_scores.items()},
+            }
+        block = np.column_stack([allocations, expected_returns])
+        grid[i] = block.reshape(block_shape + (block.shape[1],))
+        if progress and (i + 1) % 10 == 0:
+            progress(f"   {i + 1}/{len(ages)} ages evaluated")
+
+    grid.flush()
+    del grid
+    os.replace(tmp_path, path)
+
+    meta_path = os.path.join(directory, META_FILE)
+    with open(meta_path + PARTIAL_SUFFIX, 'w') as f:
+        json.dump(meta, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(meta_path + PARTIAL_SUFFIX, meta_path)
+
+    # Processes still mapping an old grid keep reading it after the unlink
+    for old in glob.glob(os.path.join(directory, GRID_PATTERN)) + [os.path.join(directory, GRID_FILE)]:
+        if old != path and os.path.exists(old):
+            os.remove(old)
+    return path
+
+class AllocationGrid:
+    """Read-only view of a grid written by build_grid()"""
+
+    def __init__(self, grid, meta):
+        self.grid = grid
+        self.model_version = meta['model_version']
+        self.targets = meta['targets']
+        self.confidence_scores = meta['confidence_scores']
+        self.axes = {name: tuple(meta['axes'][name]) for name in AXIS_ORDER}
+        self.sizes = {name: len(axis_values(*self.axes[name])) for name in AXIS_ORDER}
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map the grid in directory, or None when there is none"""
+        try:
+            with open(os.path.join(directory, META_FILE)) as f:
+                meta = json.load(f)
+            grid = np.load(os.path.join(directory, meta.get('grid_file', GRID_FILE)), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        return cls(grid, meta)
+
+    def _integer_index(self, values, name):
+        """Grid index for integer axes, -1 where the value is not on the grid"""
+        start, _, step = self.axes[name]
+        position = (values - start) / step
+        index = np.rint(position).astype(np.intp)
+        on_grid = (position == index) & (index >= 0) & (index < self.sizes[name])
+        return np.where(on_grid, index, -1)
+
+    def _interpolation_index(self, values, name):
+        """Lower cell index, fraction within the cell and in-range mask"""
+        start, _, step = self.axes[name]
+        position = (values - start) / step
+        in_range = (position >= 0) & (position <= self.sizes[name] - 1)
+        lower = np.clip(np.floor(position), 0, self.sizes[name] - 2).astype(np.intp)
+        return lower, position - lower, in_range
+
+    def lookup_many(self, features):
+        """
+        Grid answers for raw (unscaled) feature rows in FEATURE_NAMES order
+
+        Returns (in_grid mask, allocations, expected returns); rows outside
+        the grid have undefined values and must be predicted live.
+        """
+        columns = {name: features[:, FEATURE_NAMES.index(name)] for name in AXIS_ORDER}
+        age = self._integer_index(columns['age'], 'age')
+        dependents = self._integer_index(columns['dependents'], 'dependents')
+        stability = self._integer_index(columns['income_stability'], 'income_stability')
+        income, income_t, income_ok = self._interpolation_index(columns['monthly_income'], 'monthly_income')
+        expenses, expenses_t, expenses_ok = self._interpolation_index(columns['monthly_expenses'], 'monthly_expenses')
+
+        in_grid = (age >= 0) & (dependents >= 0) & (stability >= 0) & income_ok & expenses_ok
+        age, dependents, stability = (np.where(in_grid, index, 0) for index in (age, dependents, stability))
+
+        # Bilinear interpolation over the income x expenses cell
+        corner = lambda di, dj: self.grid[age, dependents, stability, income + di, expenses + dj]
+        income_t = income_t[:, None]
+        expenses_t = expenses_t[:, None]
+        values = (
+            corner(0, 0) * (1 - income_t) * (1 - expenses_t)
+            + corner(1, 0) * income_t * (1 - expenses_t)
+            + corner(0, 1) * (1 - income_t) * expenses_t
+            + corner(1, 1) * income_t * expenses_t
+        )
+        return in_grid, values[:, :-1], values[:, -1]
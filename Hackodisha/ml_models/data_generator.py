@@ -10,9 +10,15 @@ from datetime import datetime, timedelta
 import random
 import os
 import json
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# Make the project root importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.features import FEATURE_NAMES, compute_features
+
 class InvestmentDataGenerator:
     """Generate realistic investment data for training ML models"""
     
@@ -171,49 +177,25 @@ class InvestmentDataGenerator:
     
     def _calculate_derived_features(self, profile):
         """Calculate derived features from basic profile"""
-        surplus = profile['monthly_income'] - profile['monthly_expenses']
-        
+        features = compute_features(
+            profile['age'],
+            profile['monthly_income'],
+            profile['monthly_expenses'],
+            profile['dependents'],
+            profile['income_stability']
+        )[0]
         derived = {
-            'surplus': surplus,
-            'surplus_to_income_ratio': surplus / profile['monthly_income'] if profile['monthly_income'] > 0 else 0,
-            'expense_ratio': profile['monthly_expenses'] / profile['monthly_income'] if profile['monthly_income'] > 0 else 1,
-            'income_per_dependent': profile['monthly_income'] / (profile['dependents'] + 1),
-            'age_income_interaction': profile['age'] * profile['monthly_income'] / 100000,
-            'stability_surplus_interaction': profile['income_stability'] * surplus / 1000,
+            name: value
+            for name, value in zip(FEATURE_NAMES, features.tolist())
+            if name not in profile
         }
-        
-        # Risk capacity calculation
-        derived['risk_capacity'] = self._calculate_risk_capacity(profile, derived)
+        derived['income_per_dependent'] = profile['monthly_income'] / (profile['dependents'] + 1)
         
         return derived
     
-    def _calculate_risk_capacity(self, profile, derived):
-        """Calculate comprehensive risk capacity score"""
-        risk_score = 5  # Start neutral
-        
-        # Age factor (younger = higher risk tolerance)
-        if profile['age'] < 30:
-            risk_score += 2
-        elif profile['age'] < 40:
-            risk_score += 1
-        elif profile['age'] > 50:
-            risk_score -= 1
-        elif profile['age'] > 55:
-            risk_score -= 2
-        
-        # Income stability factor
-        risk_score += (profile['income_stability'] - 3)
-        
-        # Dependents factor (more dependents = lower risk)
-        risk_score -= profile['dependents'] * 0.7
-        
-        # Surplus factor
-        if derived['surplus'] > 50000:
-            risk_score += 2
-        elif derived['surplus'] > 25000:
-            risk_score += 1
-        elif derived['surplus'] < 10000:
-            risk_score -= 1.5
+    def _risk_tolerance(self, profile, derived):
+        """Risk capacity adjusted for education and location (drives outcomes, not a model feature)"""
+        risk_score = derived['risk_capacity']
         
         # Education factor (higher education = slightly higher risk tolerance)
         risk_score += (profile['education_score'] - 2) * 0.5
@@ -226,7 +208,7 @@ class InvestmentDataGenerator:
     
     def _generate_investment_outcomes(self, profile, derived):
         """Generate realistic investment allocations and outcomes"""
-        risk_capacity = derived['risk_capacity']
+        risk_capacity = self._risk_tolerance(profile, derived)
         surplus = derived['surplus']
         
         # Emergency fund allocation (always needed)
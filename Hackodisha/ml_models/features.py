@@ -0,0 +1,93 @@
+# features.py
+"""
+Feature engineering shared by training and serving.
+
+Every feature the models see is computed here, over NumPy arrays, so the
+Flask predictor, the data generator and the training script cannot drift
+apart. Scalars are accepted too and treated as a batch of one.
+"""
+import numpy as np
+
+# Column order of the feature matrix (must match feature_names.pkl)
+FEATURE_NAMES = [
+    'age', 'monthly_income', 'monthly_expenses', 'surplus', 'dependents',
+    'income_stability', 'surplus_to_income_ratio', 'expense_ratio',
+    'risk_capacity', 'age_income_interaction', 'stability_surplus_interaction'
+]
+
+# Defaults for missing profile fields
+PROFILE_DEFAULTS = {
+    'age': 30,
+    'avg_monthly_income': 50000,
+    'monthly_expenses': 30000,
+    'dependents': 1,
+    'income_stability': 3,
+}
+
+def _as_array(values):
+    return np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+def risk_capacity(age, income_stability, dependents, surplus):
+    """Risk capacity score on a 1-10 scale"""
+    age = _as_array(age)
+    surplus = _as_array(surplus)
+
+    risk_score = np.full(np.broadcast(age, surplus).shape, 5.0)  # Start with neutral
+
+    # Age factor (younger = higher risk tolerance)
+    risk_score += np.where(age < 30, 2, np.where(age < 40, 1, np.where(age > 50, -1, 0)))
+
+    # Income stability factor (stability around 3 is neutral)
+    risk_score += _as_array(income_stability) - 3
+
+    # Dependents factor (more dependents = lower risk)
+    risk_score -= _as_array(dependents) * 0.5
+
+    # Surplus factor
+    risk_score += np.where(surplus > 50000, 2, np.where(surplus > 20000, 1, np.where(surplus < 10000, -1, 0)))
+
+    # Ensure score is within bounds
+    return np.minimum(np.maximum(risk_score, 1), 10)
+
+def compute_features(age, monthly_income, monthly_expenses, dependents, income_stability):
+    """(n, 11) feature matrix in FEATURE_NAMES order"""
+    age = _as_array(age)
+    monthly_income = _as_array(monthly_income)
+    monthly_expenses = _as_array(monthly_expenses)
+    dependents = _as_array(dependents)
+    income_stability = _as_array(income_stability)
+    surplus = monthly_income - monthly_expenses
+
+    # Ratios fall back to 0 / 1 when there is no income
+    has_income = monthly_income > 0
+    safe_income = np.where(has_income, monthly_income, 1)
+    surplus_to_income_ratio = np.where(has_income, surplus / safe_income, 0)
+    expense_ratio = np.where(has_income, monthly_expenses / safe_income, 1)
+
+    return np.column_stack([
+        age,
+        monthly_income,
+        monthly_expenses,
+        surplus,
+        dependents,
+        income_stability,
+        surplus_to_income_ratio,
+        expense_ratio,
+        risk_capacity(age, income_stability, dependents, surplus),
+        age * monthly_income / 100000,
+        income_stability * surplus / 1000
+    ])
+
+def profile_features(user_profiles):
+    """Feature matrix for a list of user profile dicts (the advisor's input format)"""
+    columns = {
+        field: [profile.get(field, default) for profile in user_profiles]
+        for field, default in PROFILE_DEFAULTS.items()
+    }
+    return compute_features(
+        columns['age'],
+        columns['avg_monthly_income'],
+        columns['monthly_expenses'],
+        columns['dependents'],
+        columns['income_stability'],
+    )
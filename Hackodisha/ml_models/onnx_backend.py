@@ -0,0 +1,176 @@
+# onnx_backend.py
+"""
+ONNX export of the investment models and an onnxruntime evaluator.
+
+export_onnx() turns an ml_models.pkl model dict plus the served
+StandardScaler into a single ONNX graph:
+
+    features (raw, float64) -> Sub/Div (the scaler) -> Cast float32
+        -> one TreeEnsembleRegressor per model -> Concat -> predictions
+
+so every allocation target and the expected return come out of one
+session.run() as columns of one (n_rows, n_columns) output. The targets,
+confidence scores and fingerprints of the pickles it was exported from are
+stored in the model's metadata; OnnxAllocationModel refuses a file whose
+fingerprints do not match the pickles being served.
+
+ONNX tree ensembles compute in float32, so predictions match sklearn to
+about 1e-5 rather than bit for bit (export_onnx.py checks the parity).
+
+onnxruntime is only imported when a session is created: once loaded, a
+forked process hangs at interpreter exit (run.py works around that), so
+the other backends must not pull it in.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+try:
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    onnx = None
+
+ONNX_FILE = 'ml_models.onnx'
+INPUT_NAME = 'features'
+OUTPUT_NAME = 'predictions'
+OPSET = {'': 17, 'ai.onnx.ml': 3}
+# Oldest IR version for OPSET, so older onnxruntime releases can load the file
+IR_VERSION = 8
+
+def file_fingerprint(path):
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def model_groups(models):
+    """
+    (name, estimator, output columns) for every model in an ml_models.pkl
+    dict, in the order MLInvestmentPredictor.model_outputs() uses them
+    """
+    if models.get('multi_output'):
+        model_info = models['allocation_model']
+        groups = [('allocation_model', model_info['model'], list(model_info['targets']))]
+    else:
+        groups = [
+            (target, model_info['model'], [target])
+            for target, model_info in models.get('portfolio_allocator', {}).items()
+        ]
+    columns = [column for _, _, group_columns in groups for column in group_columns]
+    if 'expected_return' not in columns and 'return_predictor' in models:
+        groups.append(('return_predictor', models['return_predictor']['model'], ['expected_return']))
+    return groups
+
+def confidence_scores(models):
+    """Per-target confidence exactly as model_outputs() reports it"""
+    if models.get('multi_output'):
+        model_info = models['allocation_model']
+        return {
+            target: model_info.get('target_cv_scores', {}).get(target, model_info.get('cv_score', 0.5))
+            for target in model_info['targets'] if target != 'expected_return'
+        }
+    return {
+        target: model_info.get('cv_score', 0.5)
+        for target, model_info in models.get('portfolio_allocator', {}).items()
+    }
+
+def export_onnx(models, scaler, path, models_file=None, scaler_file=None):
+    """
+    Write models (an ml_models.pkl dict) with the scaler fused in as one
+    ONNX graph at path. models_file / scaler_file are the pickles being
+    served; their fingerprints are recorded so a stale export is detected.
+    """
+    if onnx is None:
+        raise ImportError("ONNX export needs the onnx and skl2onnx packages")
+
+    n_features = len(scaler.mean_)
+    nodes = [
+        helper.make_node('Sub', [INPUT_NAME, 'scaler_mean'], ['centered']),
+        helper.make_node('Div', ['centered', 'scaler_scale'], ['scaled']),
+        # Trees compare float32 inputs, as sklearn does
+        helper.make_node('Cast', ['scaled'], ['scaled_float'], to=TensorProto.FLOAT),
+    ]
+    initializers = [
+        numpy_helper.from_array(np.asarray(scaler.mean_, dtype=np.float64), 'scaler_mean'),
+        numpy_helper.from_array(np.asarray(scaler.scale_, dtype=np.float64), 'scaler_scale'),
+    ]
+
+    columns = []
+    group_outputs = []
+    for name, estimator, group_columns in model_groups(models):
+        converted = convert_sklearn(
+            estimator, initial_types=[('X', FloatTensorType([None, n_features]))], target_opset=OPSET
+        )
+        graph = onnx.compose.add_prefix(converted, f'{name}_').graph
+        nodes.append(helper.make_node('Identity', ['scaled_float'], [graph.input[0].name]))
+        nodes.extend(graph.node)
+        initializers.extend(graph.initializer)
+        group_outputs.append(graph.output[0].name)
+        columns.extend(group_columns)
+
+    nodes.append(helper.make_node('Concat', group_outputs, ['predictions_float'], axis=1))
+    nodes.append(helper.make_node('Cast', ['predictions_float'], [OUTPUT_NAME], to=TensorProto.DOUBLE))
+
+    graph = helper.make_graph(
+        nodes, 'investment_models',
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.DOUBLE, [None, n_features])],
+        [helper.make_tensor_value_info(OUTPUT_NAME, TensorProto.DOUBLE, [None, len(columns)])],
+        initializers,
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid(domain, version) for domain, version in OPSET.items()],
+        producer_name='generate_ml_models', ir_version=IR_VERSION
+    )
+    metadata = {
+        'columns': json.dumps(columns),
+        'confidence_scores': json.dumps(confidence_scores(models)),
+        'models_sha256': file_fingerprint(models_file) if models_file else '',
+        'scaler_sha256': file_fingerprint(scaler_file) if scaler_file else '',
+    }
+    helper.set_model_props(model, metadata)
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
+
+class OnnxAllocationModel:
+    """onnxruntime session answering model_outputs() for raw feature rows"""
+
+    def __init__(self, path, threads=1):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("onnxruntime is not installed")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.columns = json.loads(metadata['columns'])
+        self.confidence_scores = json.loads(metadata['confidence_scores'])
+        self.models_sha256 = metadata.get('models_sha256')
+        self.scaler_sha256 = metadata.get('scaler_sha256')
+        self.targets = [column for column in self.columns if column != 'expected_return']
+        self._target_index = [self.columns.index(target) for target in self.targets]
+        self._return_index = self.columns.index('expected_return') if 'expected_return' in self.columns else None
+
+    def matches(self, models_file, scaler_file):
+        """Whether this export was made from exactly these pickles"""
+        return (self.models_sha256 == file_fingerprint(models_file)
+                and self.scaler_sha256 == file_fingerprint(scaler_file))
+
+    def predict(self, features):
+        """(n_rows, n_columns) predictions for raw feature rows"""
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        return self.session.run([OUTPUT_NAME], {INPUT_NAME: features})[0]
+
+    def outputs(self, features):
+        """(targets, allocation predictions, expected returns or None, confidence) like model_outputs()"""
+        predictions = self.predict(features)
+        returns = None if self._return_index is None else predictions[:, self._return_index]
+        return self.targets, predictions[:, self._target_index], returns, self.confidence_scores
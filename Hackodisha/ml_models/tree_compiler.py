@@ -0,0 +1,221 @@
+# tree_compiler.py
+"""
+Compile fitted sklearn tree ensembles into flat NumPy arrays.
+
+RandomForestRegressor and GradientBoostingRegressor (and single
+DecisionTreeRegressors) are flattened into contiguous per-node arrays:
+split feature, threshold, left/right child and leaf value, with every tree
+stored back to back. Prediction walks all trees for all rows at once, one
+tree level per step, so a single row costs a handful of NumPy calls instead
+of sklearn's per-call validation and per-tree dispatch.
+
+Leaves point to themselves, so rows that reach a leaf early simply stay put
+until the deepest tree is done. As in sklearn, inputs are compared as
+float32, which keeps every split decision identical, and NaN follows each
+node's missing_go_to_left; ensembles whose sklearn predict() rejects NaN
+(gradient boosting) reject it here too.
+
+Given the StandardScaler the models were trained behind, compile_ensemble()
+folds it into the split thresholds: each threshold becomes the largest raw
+feature value that sklearn would still send left after scaling and the
+float32 cast, so the compiled model takes unscaled features and makes
+exactly the same decisions without a scaler.transform() per request.
+
+The level-by-level walk wins for small batches (the serving case); from
+about a thousand rows sklearn's compiled per-tree loops are faster, so
+predict() hands large batches back to the source estimator.
+"""
+import numpy as np
+
+# Rows walked per step, bounding the (rows x trees) index arrays
+CHUNK_ROWS = 4096
+
+# Batches this large are faster through the source estimator
+SKLEARN_BATCH_ROWS = 1024
+
+class CompiledTreeEnsemble:
+    """Flat-array evaluator for a fitted tree ensemble"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 scale, offset, n_features, estimator=None, scaler=None, missing_left=None, allow_nan=True):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.scale = scale
+        self.offset = offset
+        self.n_features = n_features
+        self.n_outputs = value.shape[1]
+        self.estimator = estimator
+        # With a folded scaler, thresholds are in raw feature space and
+        # inputs are compared unscaled at full precision
+        self.scaler = scaler
+        self.missing_left = np.zeros(len(feature), dtype=bool) if missing_left is None else missing_left
+        self.allow_nan = allow_nan
+        # Children interleaved as [left, right] so one take() picks the branch
+        self.children = np.column_stack([left, right]).ravel()
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (n_rows, n_trees)"""
+        if self.scaler is None:
+            X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        n_rows, n_trees = len(X), len(self.roots)
+        X_flat = X.ravel()
+        # Position of each (row, tree) pair's row in X_flat
+        row_starts = np.repeat(np.arange(n_rows) * self.n_features, n_trees)
+        nodes = np.tile(self.roots, n_rows)
+        has_nan = np.isnan(X_flat).any()
+        if has_nan and not self.allow_nan:
+            raise ValueError("Input X contains NaN")
+        for _ in range(self.max_depth):
+            values = X_flat.take(row_starts + self.feature.take(nodes))
+            go_right = ~(values <= self.threshold.take(nodes))
+            if has_nan:
+                missing = np.isnan(values)
+                go_right[missing] = ~self.missing_left.take(nodes[missing])
+            nodes = self.children.take(2 * nodes + go_right)
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict(self, X):
+        """Same values as the source estimator's predict()"""
+        if self.estimator is not None and len(X) >= SKLEARN_BATCH_ROWS:
+            return self.estimator.predict(X if self.scaler is None else self.scaler.transform(X))
+        return self.predict_flat(X)
+
+    def predict_flat(self, X):
+        """predict() computed with the flat arrays whatever the batch size"""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a 2D array with {self.n_features} features, got shape {X.shape}")
+
+        totals = np.empty((len(X), self.n_outputs))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self.apply(X[start:start + CHUNK_ROWS])
+            totals[start:start + CHUNK_ROWS] = self.value[leaves].sum(axis=1)
+
+        predictions = self.offset + self.scale * totals
+        return predictions[:, 0] if self.n_outputs == 1 else predictions
+
+class ScaledEstimator:
+    """An sklearn estimator behind its scaler, taking unscaled features like a folded ensemble"""
+
+    def __init__(self, estimator, scaler):
+        self.estimator = estimator
+        self.scaler = scaler
+
+    def predict(self, X):
+        return self.estimator.predict(self.scaler.transform(X))
+
+def _ordered_keys(values):
+    """int64 keys that sort like the float64 values, one key per representable double"""
+    bits = values.view(np.int64)
+    return np.where(bits >= 0, bits, -(bits & np.int64(0x7FFFFFFFFFFFFFFF)) - 1)
+
+def _from_ordered_keys(keys):
+    bits = np.where(keys >= 0, keys, (-(keys + 1)) | np.int64(-0x8000000000000000))
+    return bits.view(np.float64)
+
+def fold_scaler_thresholds(feature, threshold, mean, scale):
+    """
+    Raw-space thresholds equivalent to scaled ones
+    
+    For every node, the largest float64 x for which sklearn's test
+    float32((x - mean) / scale) <= threshold holds. The test is monotone in
+    x, so a binary search over the ordered doubles finds it exactly.
+    """
+    mean = np.asarray(mean, dtype=np.float64)[feature]
+    scale = np.asarray(scale, dtype=np.float64)[feature]
+    goes_left = lambda x: ((x - mean) / scale).astype(np.float32) <= threshold
+
+    # Bracket the answer: lo goes left, hi does not
+    estimate = threshold * scale + mean
+    width = (np.abs(estimate) + scale) * 1e-6
+    lo, hi = estimate - width, estimate + width
+    while not (goes_left(lo).all() and not goes_left(hi).any()):
+        width *= 16
+        lo = np.where(goes_left(lo), lo, estimate - width)
+        hi = np.where(goes_left(hi), estimate + width, hi)
+
+    lo_keys, hi_keys = _ordered_keys(lo), _ordered_keys(hi)
+    while (hi_keys - lo_keys > 1).any():
+        mid_keys = lo_keys + (hi_keys - lo_keys) // 2
+        left = goes_left(_from_ordered_keys(mid_keys))
+        lo_keys = np.where(left, mid_keys, lo_keys)
+        hi_keys = np.where(left, hi_keys, mid_keys)
+    return _from_ordered_keys(lo_keys)
+
+def _tree_arrays(tree, node_offset):
+    """One sklearn Tree's node arrays, with child indices shifted by node_offset"""
+    nodes = np.arange(tree.node_count)
+    is_leaf = tree.children_left == -1
+    feature = np.where(is_leaf, 0, tree.feature)
+    # Leaves loop back to themselves whichever way the comparison goes
+    left = np.where(is_leaf, nodes, tree.children_left) + node_offset
+    right = np.where(is_leaf, nodes, tree.children_right) + node_offset
+    value = tree.value[:, :, 0]
+    # Where sklearn sends NaN; older versions without the array send it right
+    missing_left = np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)), dtype=bool)
+    return feature, tree.threshold, left, right, value, missing_left
+
+def compile_ensemble(estimator, scaler=None):
+    """
+    Compile a fitted RandomForestRegressor, GradientBoostingRegressor or
+    DecisionTreeRegressor. Raises ValueError for anything else.
+    
+    With the fitted StandardScaler the estimator was trained behind, the
+    scaler is folded into the thresholds and the result takes raw features.
+    """
+    name = type(estimator).__name__
+    n_features = estimator.n_features_in_
+
+    if name == 'DecisionTreeRegressor':
+        trees = [estimator.tree_]
+        scale, offset = 1.0, 0.0
+    elif name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        trees = [tree.tree_ for tree in estimator.estimators_]
+        scale, offset = 1.0 / len(trees), 0.0
+    elif name == 'GradientBoostingRegressor':
+        if estimator.loss not in ('squared_error', 'absolute_error', 'huber', 'quantile'):
+            raise ValueError(f"Unsupported GradientBoosting loss {estimator.loss!r}")
+        trees = [stage[0].tree_ for stage in estimator.estimators_]
+        scale = estimator.learning_rate
+        if estimator.init_ == 'zero':
+            offset = 0.0
+        else:
+            offset = estimator.init_.predict(np.zeros((1, n_features))).reshape(-1)
+    else:
+        raise ValueError(f"Cannot compile {name}")
+
+    parts = []
+    roots = []
+    node_offset = 0
+    for tree in trees:
+        roots.append(node_offset)
+        parts.append(_tree_arrays(tree, node_offset))
+        node_offset += tree.node_count
+
+    feature, threshold, left, right, value, missing_left = (np.concatenate(column) for column in zip(*parts))
+    feature = feature.astype(np.intp)
+    if scaler is not None:
+        threshold = fold_scaler_thresholds(feature, threshold, scaler.mean_, scaler.scale_)
+    return CompiledTreeEnsemble(
+        feature=np.ascontiguousarray(feature, dtype=np.intp),
+        threshold=np.ascontiguousarray(threshold, dtype=np.float64),
+        left=np.ascontiguousarray(left, dtype=np.intp),
+        right=np.ascontiguousarray(right, dtype=np.intp),
+        value=np.ascontiguousarray(value, dtype=np.float64),
+        roots=np.array(roots, dtype=np.intp),
+        max_depth=max(tree.max_depth for tree in trees),
+        scale=scale,
+        offset=offset,
+        n_features=n_features,
+        estimator=estimator,
+        scaler=scaler,
+        missing_left=missing_left,
+        # GradientBoostingRegressor.predict() raises on NaN
+        allow_nan=name != 'GradientBoostingRegressor',
+    )
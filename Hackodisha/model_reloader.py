@@ -0,0 +1,123 @@
+# model_reloader.py
+"""
+Hot reload of retrained models.
+
+ModelReloader polls the saved-models directory. When the artifacts change
+and then stay unchanged for one more poll (so a half-written pickle is not
+picked up), it builds a complete new predictor in its own thread, validates
+it, and hands it to a swap callback that replaces the served reference in
+one assignment. Requests already running keep the predictor they started
+with; a model set that fails to load or validate is logged and ignored
+until the files change again.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import app_logging
+
+log = logging.getLogger(f'{app_logging.LOGGER}.model_reloader')
+
+# Files whose changes trigger a reload
+WATCHED_SUFFIXES = ('.pkl', '.onnx', '.npy', '.json')
+
+def directory_signature(directory):
+    """(name, mtime_ns, size) of every watched file, sorted"""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return ()
+    signature = []
+    for entry in entries:
+        if entry.is_file() and entry.name.endswith(WATCHED_SUFFIXES):
+            stat = entry.stat()
+            signature.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(signature))
+
+class ModelReloader:
+    """Background watcher that loads, validates and swaps in new model sets"""
+
+    def __init__(self, directory, load, swap, interval=10.0):
+        """
+        load() must return a ready predictor or raise; swap(predictor)
+        installs it. interval is the polling period in seconds.
+        """
+        self.directory = directory
+        self._load = load
+        self._swap = swap
+        self.interval = interval
+        self._signature = directory_signature(directory)
+        self._pending = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_check = None
+        self.last_reload = None
+        self.last_error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='ml-model-reloader', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                log.exception("❌ Model watcher check failed")
+
+    def check(self):
+        """Poll once; reloads when a change has been stable for one interval"""
+        signature = directory_signature(self.directory)
+        self.last_check = datetime.now().isoformat()
+        if signature == self._signature:
+            self._pending = None
+            return False
+        if signature != self._pending:
+            # Changed since the last poll: wait for the writer to finish
+            self._pending = signature
+            return False
+        self._pending = None
+        self._signature = signature
+        return self.reload()
+
+    def reload(self):
+        """Load, validate and swap in the current artifacts; False if rejected"""
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                predictor = self._load()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = {'at': datetime.now().isoformat(), 'error': str(e)}
+                log.error("❌ Model reload rejected, keeping the current models: %s", e)
+                return False
+            self._swap(predictor)
+            self.reloads += 1
+            self.last_reload = {
+                'at': datetime.now().isoformat(),
+                'model_version': getattr(predictor, 'model_version', None),
+                'seconds': round(time.perf_counter() - start, 3),
+            }
+            log.info("🔄 Models reloaded: %s (%ss)", self.last_reload['model_version'], self.last_reload['seconds'])
+            return True
+
+    def stats(self):
+        """Watcher state for /health and /model_info"""
+        return {
+            'enabled': self._thread is not None and not self._stop.is_set(),
+            'interval_seconds': self.interval,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_check': self.last_check,
+            'last_reload': self.last_reload,
+            'last_error': self.last_error,
+        }
@@ -1,16 +1,22 @@
 import json
+import logging
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from config import Config
+import app_logging
+
+log = logging.getLogger(f'{app_logging.LOGGER}.simple_model')
+# Per-request messages, rate limited per message (see app_logging.py)
+request_log = logging.getLogger(app_logging.REQUEST_LOGGER)
 
 # Import ML components
 try:
     from ml_models.predictor import MLInvestmentPredictor
     ML_AVAILABLE = True
-    print("✅ ML models available")
+    log.info("✅ ML models available")
 except ImportError as e:
-    print(f"⚠️ ML models not available: {e}")
+    log.warning("⚠️ ML models not available: %s", e)
     ML_AVAILABLE = False
 
 class SimpleInvestmentAdvisor:
@@ -22,9 +28,9 @@ class SimpleInvestmentAdvisor:
             try:
                 self.ml_predictor = MLInvestmentPredictor()
                 self.use_ml = True
-                print("🤖 ML-powered advisor initialized")
+                log.info("🤖 ML-powered advisor initialized")
             except Exception as e:
-                print(f"⚠️ ML initialization failed: {e}")
+                log.exception("⚠️ ML initialization failed: %s", e)
                 self.ml_predictor = None
                 self.use_ml = False
         else:
@@ -53,7 +59,7 @@ class SimpleInvestmentAdvisor:
         # Try ML prediction first
         if self.use_ml and self.ml_predictor:
             try:
-                print("🤖 Using ML-powered recommendation engine...")
+                request_log.info("🤖 Using ML-powered recommendation engine...")
                 ml_result = self.ml_predictor.generate_ml_recommendations(user_profile)
                 
                 # Add ML indicator to response
@@ -63,11 +69,11 @@ class SimpleInvestmentAdvisor:
                 return ml_result
                 
             except Exception as e:
-                print(f"🔄 ML prediction failed, falling back to rule-based: {e}")
+                request_log.exception("🔄 ML prediction failed, falling back to rule-based: %s", e)
                 # Fall back to rule-based approach
         
         # Rule-based recommendation (fallback)
-        print("📊 Using rule-based recommendation engine...")
+        request_log.info("📊 Using rule-based recommendation engine...")
         return self.generate_rule_based_recommendation(user_profile)
     
     def generate_rule_based_recommendation(self, user_profile):
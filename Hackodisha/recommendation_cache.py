@@ -0,0 +1,118 @@
+# recommendation_cache.py
+"""
+Bounded LRU + TTL cache with single-flight computation.
+
+Concurrent requests for the same key wait for the one computation already
+in progress instead of repeating it. Values are shared between callers, so
+get_or_compute() hands out a shallow copy of the cached dict; callers may
+add top-level keys but must not modify nested values.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class _Flight:
+    """One in-progress computation that other callers can wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class RecommendationCache:
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """
+        Cached value for key, computing it at most once at a time
+
+        cacheable(value) can veto storing a result (e.g. a fallback answer);
+        exceptions from compute() reach every waiting caller and are not cached.
+        """
+        if self.max_entries <= 0:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._entries[key]
+                self.expirations += 1
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return dict(flight.value)
+
+        try:
+            value = compute()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+            raise
+
+        flight.value = value
+        with self._lock:
+            del self._flights[key]
+            if cacheable is None or cacheable(value):
+                self._store(key, value)
+        flight.done.set()
+        return dict(value)
+
+    def _store(self, key, value):
+        """Insert under the lock, evicting least recently used entries"""
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for /health"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'enabled': self.max_entries > 0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            }
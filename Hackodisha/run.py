@@ -0,0 +1,173 @@
+# run.py
+"""
+Production launcher for the investment advisor.
+
+Loads the models once in a master process, then forks worker processes
+that share that memory copy-on-write (gunicorn with preload_app):
+
+    python run.py --workers 4 --threads 4 --bind 0.0.0.0:5000
+
+Each worker caps its BLAS/OpenMP pools at --blas-threads (default 1) so
+workers x threads do not oversubscribe the CPUs, and --cpu-affinity pins
+each worker to one core. Objects loaded before the fork are frozen out of
+the garbage collector so collections in the workers do not touch (and
+copy) their pages.
+
+Graceful restarts use gunicorn's signals: HUP replaces the workers with
+fresh forks of the loaded master, TERM lets in-flight requests finish
+before exiting, and --max-requests recycles workers periodically.
+Retrained models are picked up by the model watcher (MODEL_RELOAD_INTERVAL),
+which runs in the master only: once it has loaded and swapped in a new
+model set it sends the master HUP, so the workers are replaced by forks
+that share the new models too. Every worker logs its resident and
+proportional set size once it is up.
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+
+import app_logging
+from config import Config
+
+# Thread pools sized from the environment when numpy / sklearn load
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+def memory_usage(pid='self'):
+    """Resident, proportional and shared set size in MB from /proc, or None on other platforms"""
+    sizes = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    sizes[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        'rss_mb': round(sizes.get('Rss', 0), 1),
+        'pss_mb': round(sizes.get('Pss', 0), 1),
+        'shared_mb': round(sizes.get('Shared_Clean', 0) + sizes.get('Shared_Dirty', 0), 1),
+    }
+
+def describe_memory(usage):
+    if usage is None:
+        return "memory usage unavailable"
+    return f"RSS {usage['rss_mb']} MB, PSS {usage['pss_mb']} MB, shared {usage['shared_mb']} MB"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the investment advisor with preloaded, forked workers")
+    parser.add_argument('--bind', default=f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+    parser.add_argument('--workers', type=int, default=Config.WEB_WORKERS, help="worker processes")
+    parser.add_argument('--threads', type=int, default=Config.WEB_THREADS, help="request threads per worker")
+    parser.add_argument('--blas-threads', type=int, default=Config.WORKER_BLAS_THREADS,
+                        help="BLAS/OpenMP threads per worker")
+    parser.add_argument('--cpu-affinity', action='store_true', help="pin each worker to one CPU core")
+    parser.add_argument('--timeout', type=int, default=30, help="seconds before a stuck worker is restarted")
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help="seconds workers get to finish requests on restart or shutdown")
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help="restart a worker after this many requests (0 = never)")
+    parser.add_argument('--max-requests-jitter', type=int, default=0)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Must happen before numpy is imported
+    for name in BLAS_ENV_VARS:
+        os.environ[name] = str(args.blas_threads)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ gunicorn is not installed (pip install -r requirements.txt)")
+        return 1
+
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        threadpool_limits = None
+
+    advisor = None
+
+    def load_advisor():
+        """Import the app in the master and wait until the models are loaded and warm"""
+        nonlocal advisor
+        import app as advisor
+        if advisor.ml_predictor is not None:
+            advisor.ml_predictor.ready.wait()
+        # Workers never reload on their own: a private copy per worker would
+        # end the sharing. The master reloads and re-forks them instead
+        advisor.start_model_reloader(after_swap=refork_workers)
+        gc.collect()
+        gc.freeze()
+        print(f"📦 Models preloaded in master {os.getpid()}: {describe_memory(memory_usage())}")
+        return advisor.app
+
+    def refork_workers(predictor):
+        """Runs in the master's watcher thread once new models are being served"""
+        gc.collect()
+        gc.freeze()
+        print(f"🔄 Models {predictor.model_version} preloaded in master: {describe_memory(memory_usage())}; "
+              f"replacing workers")
+        # Gunicorn's graceful reload: new workers are forked from the current master
+        os.kill(os.getpid(), signal.SIGHUP)
+
+    def post_fork(server, worker):
+        if threadpool_limits is not None:
+            threadpool_limits(args.blas_threads)
+        if args.cpu_affinity and hasattr(os, 'sched_setaffinity'):
+            cpus = sorted(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, {cpus[worker.age % len(cpus)]})
+
+    def worker_exit(server, worker):
+        # Write out log records still queued for the writer thread
+        app_logging.stop_logging()
+        # onnxruntime hangs in interpreter shutdown after fork(): end the
+        # worker here, with its exit status, once gunicorn has cleaned up
+        if 'onnxruntime' in sys.modules:
+            error = sys.exc_info()[1]
+            code = error.code if isinstance(error, SystemExit) else (0 if error is None else 1)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code if isinstance(code, int) else 1)
+
+    def post_worker_init(worker):
+        cpus = f", CPUs {sorted(os.sched_getaffinity(0))}" if args.cpu_affinity and hasattr(os, 'sched_getaffinity') else ""
+        print(f"👷 Worker {worker.pid} ready: {describe_memory(memory_usage())}{cpus}")
+
+    def when_ready(server):
+        print(f"🚀 Serving on {args.bind}: {args.workers} workers x {args.threads} threads, "
+              f"{args.blas_threads} BLAS thread(s) per worker")
+
+    class AdvisorServer(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread' if args.threads > 1 else 'sync',
+                'preload_app': True,
+                'timeout': args.timeout,
+                'graceful_timeout': args.graceful_timeout,
+                'max_requests': args.max_requests,
+                'max_requests_jitter': args.max_requests_jitter,
+                'post_fork': post_fork,
+                'post_worker_init': post_worker_init,
+                'worker_exit': worker_exit,
+                'when_ready': when_ready,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_advisor()
+
+    AdvisorServer().run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
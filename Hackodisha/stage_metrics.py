@@ -0,0 +1,177 @@
+# stage_metrics.py
+"""
+Per-stage latency histograms in Prometheus text format.
+
+A request is opened with begin(route) / end() (the Flask app does this in
+before_request / teardown_request). Code inside it wraps each stage in
+
+    with stage_metrics.stage('features'):
+        ...
+
+and the elapsed time lands in a histogram labelled with the route, the
+stage and optionally the model target. Only a sample_rate fraction of
+requests is timed; for the others stage() returns a shared no-op context,
+so an unsampled stage costs one thread-local lookup. Code running outside
+a request (warm-up, reload smoke tests) is never recorded.
+
+With a tracer (tracing.py), the stages of requests being traced are also
+recorded as spans of the request's trace, whether or not they are sampled
+for the histograms.
+
+Each process keeps its own histograms: behind run.py a scrape of /metrics
+is answered by one worker, labelled with its pid.
+"""
+import bisect
+import os
+import random
+import threading
+import time
+
+# Upper bounds in seconds; stages range from microseconds to whole requests
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _NoTimer:
+    """Context used for stages of requests that are not sampled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+class _StageTimer:
+    __slots__ = ('metrics', 'key', 'observe', 'record_span', 'start')
+
+    def __init__(self, metrics, key, observe, record_span):
+        self.metrics = metrics
+        self.key = key
+        self.observe = observe
+        self.record_span = record_span
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        if self.observe:
+            self.metrics._observe(self.metrics._stages, self.key, (end - self.start) / 1e9)
+        if self.record_span is not None:
+            _, stage, target = self.key
+            self.record_span(f"{stage} {target}" if target else stage, self.start, end)
+        return False
+
+class StageMetrics:
+    """Thread-safe registry of request and stage duration histograms"""
+
+    def __init__(self, sample_rate=1.0, buckets=DEFAULT_BUCKETS, prefix='advisor', tracer=None):
+        self.sample_rate = sample_rate
+        self.tracer = tracer
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._requests = {}    # route -> request count
+        self._durations = {}   # (route,) -> histogram
+        self._stages = {}      # (route, stage, target) -> histogram
+
+    def begin(self, route):
+        """Start a request; decides whether its stages are timed"""
+        with self._lock:
+            self._requests[route] = self._requests.get(route, 0) + 1
+        sampled = self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        record_span = self.tracer.stage_recorder() if self.tracer is not None else None
+        if sampled or record_span is not None:
+            self._local.request = (route, time.perf_counter(), sampled, record_span)
+        else:
+            self._local.request = None
+
+    def end(self):
+        """Finish the current request, recording its duration if it was sampled"""
+        current = getattr(self._local, 'request', None)
+        self._local.request = None
+        if current is not None and current[2]:
+            route, start = current[:2]
+            self._observe(self._durations, (route,), time.perf_counter() - start)
+
+    def stage(self, name, target=''):
+        """Context manager timing one stage of the current request"""
+        current = getattr(self._local, 'request', None)
+        if current is None:
+            return _NO_TIMER
+        return _StageTimer(self, (current[0], name, target), current[2], current[3])
+
+    def _observe(self, histograms, key, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last one is +Inf), sum of seconds
+                histogram = histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._durations.clear()
+            self._stages.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            requests = dict(self._requests)
+            durations = {key: (list(counts), total) for key, (counts, total) in self._durations.items()}
+            stages = {key: (list(counts), total) for key, (counts, total) in self._stages.items()}
+
+        pid = os.getpid()
+        lines = [
+            f"# HELP {self.prefix}_requests_total Requests handled, sampled or not",
+            f"# TYPE {self.prefix}_requests_total counter",
+        ]
+        for route, count in sorted(requests.items()):
+            lines.append(f'{self.prefix}_requests_total{{{_labels(pid=pid, route=route)}}} {count}')
+
+        lines += [
+            f"# HELP {self.prefix}_stage_sample_rate Fraction of requests whose stages are timed",
+            f"# TYPE {self.prefix}_stage_sample_rate gauge",
+            f'{self.prefix}_stage_sample_rate{{{_labels(pid=pid)}}} {self.sample_rate:g}',
+        ]
+
+        name = f"{self.prefix}_request_duration_seconds"
+        lines += [f"# HELP {name} Duration of sampled requests", f"# TYPE {name} histogram"]
+        for (route,), histogram in sorted(durations.items()):
+            lines += self._histogram_lines(name, _labels(pid=pid, route=route), histogram)
+
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines += [f"# HELP {name} Duration of each stage of sampled requests", f"# TYPE {name} histogram"]
+        for (route, stage, target), histogram in sorted(stages.items()):
+            lines += self._histogram_lines(name, _labels(pid=pid, route=route, stage=stage, target=target), histogram)
+
+        return '\n'.join(lines) + '\n'
+
+    def _histogram_lines(self, name, labels, histogram):
+        counts, total = histogram
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f'{bound:g}'
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {total:.9f}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    """Prometheus label set, with values escaped"""
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
@@ -0,0 +1,6 @@
+# conftest.py
+"""Run the tests from anywhere with the Hackodisha modules importable"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
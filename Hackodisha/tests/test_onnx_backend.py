@@ -0,0 +1,98 @@
+# test_onnx_backend.py
+"""The ONNX export must answer outputs() like the sklearn models behind the scaler"""
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("skl2onnx")
+
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from ml_models.features import compute_features
+from ml_models.onnx_backend import OnnxAllocationModel, export_onnx
+
+# ONNX tree ensembles compute in float32 (see export_onnx.py)
+TOLERANCE = 1e-4
+
+TARGETS = ['emergency_fund_allocation', 'equity_allocation', 'debt_allocation', 'gold_allocation']
+
+def profiles(rng, n_rows):
+    return compute_features(
+        rng.integers(18, 71, n_rows), rng.integers(10000, 300000, n_rows), rng.integers(0, 300000, n_rows),
+        rng.integers(0, 6, n_rows), rng.integers(1, 6, n_rows)
+    )
+
+@pytest.fixture(scope='module')
+def training():
+    rng = np.random.default_rng(11)
+    X = profiles(rng, 1500)
+    scaler = StandardScaler().fit(X)
+    signal = np.tanh(scaler.transform(X)[:, :4])
+    y = {target: 25 + 10 * signal[:, i] + rng.normal(0, 1, len(X)) for i, target in enumerate(TARGETS)}
+    y['expected_return'] = 8 + signal.sum(axis=1) + rng.normal(0, 0.2, len(X))
+    return X, y, scaler, profiles(rng, 500)
+
+def per_target_models(X_scaled, y):
+    allocator = {}
+    for i, target in enumerate(TARGETS):
+        estimator = (RandomForestRegressor(n_estimators=15, max_depth=8, random_state=i) if i % 2
+                     else GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=i))
+        allocator[target] = {'model': estimator.fit(X_scaled, y[target]), 'cv_score': 0.5 + i / 10}
+    return_model = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=9).fit(X_scaled, y['expected_return'])
+    return {'portfolio_allocator': allocator, 'return_predictor': {'model': return_model}}
+
+def multi_output_models(X_scaled, y):
+    targets = TARGETS + ['expected_return']
+    model = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0)
+    model.fit(X_scaled, np.column_stack([y[target] for target in targets]))
+    return {
+        'multi_output': True,
+        'allocation_model': {
+            'model': model,
+            'targets': targets,
+            'cv_score': 0.7,
+            'target_cv_scores': {target: 0.6 + i / 20 for i, target in enumerate(targets)},
+        },
+    }
+
+def sklearn_outputs(models, scaler, features):
+    """(allocations, expected returns, confidence) computed with sklearn"""
+    scaled = scaler.transform(features)
+    if models.get('multi_output'):
+        info = models['allocation_model']
+        predictions = info['model'].predict(scaled)
+        confidence = {target: info['target_cv_scores'][target] for target in TARGETS}
+        return predictions[:, :len(TARGETS)], predictions[:, len(TARGETS)], confidence
+    allocator = models['portfolio_allocator']
+    allocations = np.column_stack([allocator[target]['model'].predict(scaled) for target in TARGETS])
+    returns = models['return_predictor']['model'].predict(scaled)
+    return allocations, returns, {target: info['cv_score'] for target, info in allocator.items()}
+
+@pytest.mark.parametrize('layout', [per_target_models, multi_output_models], ids=['per_target', 'multi_output'])
+def test_onnx_outputs_match_sklearn(layout, training, tmp_path):
+    X, y, scaler, test = training
+    models = layout(scaler.transform(X), y)
+    path = str(tmp_path / 'ml_models.onnx')
+    export_onnx(models, scaler, path)
+
+    targets, allocations, returns, confidence = OnnxAllocationModel(path).outputs(test)
+    expected_allocations, expected_returns, expected_confidence = sklearn_outputs(models, scaler, test)
+
+    assert targets == TARGETS
+    assert confidence == pytest.approx(expected_confidence)
+    assert np.max(np.abs(allocations - expected_allocations)) <= TOLERANCE
+    assert np.max(np.abs(returns - expected_returns)) <= TOLERANCE
+
+def test_export_records_pickle_fingerprints(training, tmp_path):
+    X, y, scaler, _ = training
+    models_file, scaler_file = tmp_path / 'ml_models.pkl', tmp_path / 'scaler.pkl'
+    models_file.write_bytes(b'models')
+    scaler_file.write_bytes(b'scaler')
+    path = str(tmp_path / 'ml_models.onnx')
+    export_onnx(per_target_models(scaler.transform(X), y), scaler, path, str(models_file), str(scaler_file))
+
+    onnx_model = OnnxAllocationModel(path)
+    assert onnx_model.matches(str(models_file), str(scaler_file))
+    scaler_file.write_bytes(b'refreshed scaler')
+    assert not onnx_model.matches(str(models_file), str(scaler_file))
@@ -0,0 +1,90 @@
+# test_tree_compiler.py
+"""Compiled tree ensembles must predict exactly what sklearn predicts"""
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from ml_models.tree_compiler import compile_ensemble
+
+TOLERANCE = 1e-9
+
+ESTIMATORS = {
+    'random_forest': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingRegressor(n_estimators=40, max_depth=4, random_state=0),
+    'decision_tree': lambda: DecisionTreeRegressor(max_depth=10, random_state=0),
+}
+
+def raw_profiles(rng, n_rows):
+    """Feature rows on very different scales, like age, income and ratios"""
+    return np.column_stack([
+        rng.integers(18, 70, n_rows),
+        rng.uniform(10000, 250000, n_rows),
+        rng.uniform(0, 150000, n_rows),
+        rng.integers(0, 5, n_rows),
+        rng.uniform(0, 1, n_rows),
+    ]).astype(np.float64)
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(7)
+    X = raw_profiles(rng, 2000)
+    y = 0.3 * X[:, 0] + (X[:, 1] - X[:, 2]) / 5000 + 10 * X[:, 4] + rng.normal(0, 1, len(X))
+    scaler = StandardScaler().fit(X)
+    return X, y, scaler, raw_profiles(rng, 500)
+
+@pytest.fixture(scope='module', params=sorted(ESTIMATORS))
+def fitted(request, data):
+    X, y, scaler, _ = data
+    return ESTIMATORS[request.param]().fit(scaler.transform(X), y)
+
+def threshold_rows(compiled, rows, rng):
+    """rows with one split feature set exactly onto its threshold, and one step above it"""
+    internal = np.flatnonzero(compiled.left != np.arange(len(compiled.left)))
+    nodes = rng.choice(internal, len(rows))
+    index = np.arange(len(rows))
+    features, thresholds = compiled.feature[nodes], compiled.threshold[nodes]
+    on, above, above32 = rows.copy(), rows.copy(), rows.copy()
+    on[index, features] = thresholds
+    above[index, features] = np.nextafter(thresholds, np.inf)
+    above32[index, features] = np.nextafter(thresholds.astype(np.float32), np.float32(np.inf))
+    return np.vstack([rows, on, above, above32])
+
+def with_nans(rows, rng):
+    rows = rows.copy()
+    rows[rng.random(rows.shape) < 0.3] = np.nan
+    return rows
+
+def test_compiled_matches_sklearn(fitted, data):
+    _, _, scaler, test = data
+    compiled = compile_ensemble(fitted)
+    X = threshold_rows(compiled, scaler.transform(test), np.random.default_rng(1))
+    assert np.max(np.abs(compiled.predict_flat(X) - fitted.predict(X))) <= TOLERANCE
+
+def test_folded_scaler_matches_sklearn_behind_scaler(fitted, data):
+    _, _, scaler, test = data
+    compiled = compile_ensemble(fitted, scaler)
+    X = threshold_rows(compiled, test, np.random.default_rng(2))
+    expected = fitted.predict(scaler.transform(X))
+    assert np.max(np.abs(compiled.predict_flat(X) - expected)) <= TOLERANCE
+
+@pytest.mark.parametrize('folded', [False, True], ids=['plain', 'folded'])
+def test_nan_inputs_follow_sklearn(fitted, data, folded):
+    _, _, scaler, test = data
+    compiled = compile_ensemble(fitted, scaler if folded else None)
+    X = with_nans(test if folded else scaler.transform(test), np.random.default_rng(3))
+    sklearn_X = scaler.transform(X) if folded else X
+    if isinstance(fitted, GradientBoostingRegressor):
+        with pytest.raises(ValueError):
+            fitted.predict(sklearn_X)
+        with pytest.raises(ValueError):
+            compiled.predict_flat(X)
+        return
+    assert np.max(np.abs(compiled.predict_flat(X) - fitted.predict(sklearn_X))) <= TOLERANCE
+
+def test_rejects_other_estimators(data):
+    X, y, _, _ = data
+    with pytest.raises(ValueError):
+        compile_ensemble(LinearRegression().fit(X, y))
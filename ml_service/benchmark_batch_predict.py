@@ -0,0 +1,61 @@
+# benchmark_batch_predict.py
+"""
+Compare the vectorized /batch_predict path against the per-record loop.
+
+Usage:
+    python benchmark_batch_predict.py [n_records ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from serve import InputData, predict, score_records
+
+def make_records(n_records, seed=42):
+    """Generate synthetic expense records around the training distribution"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        'income': rng.integers(20000, 45000, n_records),
+        'house_rent': rng.integers(2500, 4000, n_records),
+        'food_costs': rng.integers(6000, 11000, n_records),
+        'electricity': rng.integers(350, 800, n_records),
+        'gas': rng.integers(750, 900, n_records),
+        'water': rng.integers(380, 480, n_records),
+        'misc': rng.integers(1000, 5500, n_records),
+    }
+    rows = zip(*(values.tolist() for values in columns.values()))
+    return [InputData(**dict(zip(columns, row))) for row in rows]
+
+def time_call(func, records, repeat=3):
+    """Best-of-N wall time for func(records)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(records)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def per_record_loop(records):
+    """The previous /batch_predict implementation"""
+    return [predict(data) for data in records]
+
+def run_benchmark(sizes):
+    """Print records/sec for both paths at each batch size"""
+    print(f"{'records':>10} {'loop rec/s':>14} {'vectorized rec/s':>18} {'speedup':>9}")
+    for n_records in sizes:
+        records = make_records(n_records)
+
+        if per_record_loop(records) != score_records(records):
+            raise AssertionError(f"Vectorized results differ from predict() for n={n_records}")
+
+        loop_time = time_call(per_record_loop, records)
+        vector_time = time_call(score_records, records)
+        print(
+            f"{n_records:>10,} {n_records / loop_time:>14,.0f} "
+            f"{n_records / vector_time:>18,.0f} {loop_time / vector_time:>8.1f}x"
+        )
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    run_benchmark(sizes)
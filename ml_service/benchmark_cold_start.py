@@ -0,0 +1,54 @@
+# benchmark_cold_start.py
+"""
+Measure cold-start time to the first successful /predict.
+
+Each run starts a fresh interpreter that imports serve.py and issues one
+/predict through the in-process ASGI client, once with the saved model
+artifact and once with in-process training forced by pointing
+BASELINE_MODEL_PATH at a missing file.
+
+Usage:
+    python benchmark_cold_start.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD_SCRIPT = """
+from fastapi.testclient import TestClient
+import serve
+client = TestClient(serve.app)
+response = client.post("/predict", json={
+    "income": 30000, "house_rent": 3000, "food_costs": 8500,
+    "electricity": 600, "gas": 820, "water": 430, "misc": 2500,
+})
+response.raise_for_status()
+"""
+
+def cold_start(env_overrides):
+    """Wall time from process spawn until the first /predict has succeeded"""
+    env = {**os.environ, **env_overrides}
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD_SCRIPT],
+        cwd=SERVICE_DIR, env=env, check=True, capture_output=True,
+    )
+    return time.perf_counter() - start
+
+def run_benchmark(runs):
+    """Print median and best cold-start times for both startup paths"""
+    scenarios = {
+        "artifact": {},
+        "train at startup": {"BASELINE_MODEL_PATH": os.path.join(SERVICE_DIR, "missing_model.json")},
+    }
+    print(f"{'startup path':<18} {'median (ms)':>12} {'best (ms)':>10}")
+    for name, env_overrides in scenarios.items():
+        timings = [cold_start(env_overrides) * 1000 for _ in range(runs)]
+        print(f"{name:<18} {statistics.median(timings):>12.0f} {min(timings):>10.0f}")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
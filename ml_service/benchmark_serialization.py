@@ -0,0 +1,59 @@
+# benchmark_serialization.py
+"""
+Payload size and serialization time for /predict and /batch_predict responses.
+
+Compares FastAPI's default encoding (jsonable_encoder + JSONResponse) with the
+negotiated encoders in encoding.py, for full and compact responses.
+
+Usage:
+    python benchmark_serialization.py [batch_size ...]
+"""
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import encoding
+from benchmark_batch_predict import make_records
+from serve import score_records
+
+def fastapi_default(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+ENCODERS = {
+    "fastapi default": fastapi_default,
+    "json (negotiated)": encoding.encode_json,
+}
+if encoding.msgpack is not None:
+    ENCODERS["msgpack"] = encoding.encode_msgpack
+
+def time_encoder(encoder, payload, min_seconds=0.2):
+    """Mean seconds per call, repeating until min_seconds has elapsed"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        encoder(payload)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def run_benchmark(batch_sizes):
+    json_backend = "orjson" if encoding.orjson is not None else "stdlib json"
+    print(f"JSON backend: {json_backend}; msgpack: {'yes' if encoding.msgpack else 'not installed'}")
+    print(f"{'batch':>7} {'shape':<8} {'encoder':<18} {'bytes':>11} {'us/response':>12} {'us/record':>10}")
+    for batch_size in batch_sizes:
+        records = make_records(batch_size)
+        for shape, compact in (("full", False), ("compact", True)):
+            results = score_records(records, compact=compact)
+            payload = results[0] if batch_size == 1 else {"predictions": results, "count": len(results)}
+            for name, encoder in ENCODERS.items():
+                seconds = time_encoder(encoder, payload)
+                print(
+                    f"{batch_size:>7,} {shape:<8} {name:<18} {len(encoder(payload)):>11,} "
+                    f"{seconds * 1e6:>12.1f} {seconds * 1e6 / batch_size:>10.2f}"
+                )
+
+if __name__ == "__main__":
+    run_benchmark([int(arg) for arg in sys.argv[1:]] or [1, 1000, 10000])
@@ -0,0 +1,182 @@
+# benchmark_service.py
+"""
+Latency and throughput benchmark suite for the expense service.
+
+The app runs in-process behind httpx's ASGI transport (no network), so the
+numbers cover routing, validation, scoring and serialization. Each scenario
+drives /predict or /batch_predict at a given concurrency and batch size and
+reports p50/p95/p99 latency, records/sec and peak RSS.
+
+Results are written as JSON. When a baseline file exists the run is compared
+against it and exits non-zero if any scenario regressed beyond the threshold.
+
+Usage:
+    python benchmark_service.py                       # run and compare
+    python benchmark_service.py --update-baseline     # run and record baseline
+    python benchmark_service.py --concurrency 1 16 --batch-sizes 100 --requests 500
+
+Requires httpx (also needed by fastapi.testclient).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+import serve
+from benchmark_batch_predict import make_records
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = os.path.join(SERVICE_DIR, 'benchmark_baseline.json')
+DEFAULT_OUTPUT_PATH = os.path.join(SERVICE_DIR, 'benchmark_results.json')
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+async def run_scenario(client, path, payloads, records_per_request, concurrency, n_requests):
+    """Send n_requests from `concurrency` workers and summarize their latencies"""
+    latencies = []
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request
+        while next_request < n_requests:
+            payload = payloads[next_request % len(payloads)]
+            next_request += 1
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'path': path,
+        'concurrency': concurrency,
+        'records_per_request': records_per_request,
+        'requests': n_requests,
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'requests_per_sec': round(n_requests / elapsed, 1),
+        'records_per_sec': round(n_requests * records_per_request / elapsed, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+async def run_suite(concurrency_levels, batch_sizes, n_requests):
+    """Run every /predict and /batch_predict scenario"""
+    records = [record.dict() for record in make_records(max(batch_sizes + [256]))]
+    scenarios = {}
+
+    transport = httpx.ASGITransport(app=serve.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        # Warm up code paths and allocator before timing anything
+        await run_scenario(client, '/predict', records[:32], 1, 4, 64)
+
+        for concurrency in concurrency_levels:
+            name = f"predict c={concurrency}"
+            scenarios[name] = await run_scenario(
+                client, '/predict', records[:256], 1, concurrency, n_requests
+            )
+            print_scenario(name, scenarios[name])
+
+        for batch_size in batch_sizes:
+            batch = records[:batch_size]
+            for concurrency in concurrency_levels:
+                name = f"batch_predict b={batch_size} c={concurrency}"
+                # Large batches get proportionally fewer requests to bound run time
+                batch_requests = max(concurrency * 4, n_requests // max(1, batch_size // 10))
+                scenarios[name] = await run_scenario(
+                    client, '/batch_predict', [batch], batch_size, concurrency, batch_requests
+                )
+                print_scenario(name, scenarios[name])
+
+    return scenarios
+
+def print_scenario(name, result):
+    print(
+        f"{name:<32} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+        f"p99 {result['p99_ms']:>8.2f}ms  {result['records_per_sec']:>11,.0f} rec/s  "
+        f"rss {result['peak_rss_mb']:.0f}MB"
+    )
+
+def compare(results, baseline, threshold):
+    """Regression messages for scenarios worse than baseline by more than threshold"""
+    regressions = []
+    for name, result in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+        if result['records_per_sec'] < previous['records_per_sec'] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {previous['records_per_sec']:,.0f} -> {result['records_per_sec']:,.0f} rec/s"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the expense service in-process")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--requests', type=int, default=1000, help="requests per /predict scenario")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="allowed fractional regression before failing (default 0.15)")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="write this run as the new baseline instead of comparing")
+    args = parser.parse_args()
+
+    scenarios = asyncio.run(run_suite(args.concurrency, args.batch_sizes, args.requests))
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'model_version': serve.model.model_version,
+            'coalescing': serve.coalescer is not None,
+        },
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'scenarios': scenarios,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# coalescer.py
+"""
+Micro-batching for single-record requests.
+
+Concurrent callers are held for a short window (or until the batch is full),
+scored together with one call to the batch scoring function in the event
+loop's default executor, and each caller's future is resolved with its own
+result.
+"""
+import asyncio
+
+from metrics import Histogram
+
+class BatchCoalescer:
+    """Queue concurrent submissions and score them as one batch"""
+
+    def __init__(self, score_batch, window_seconds=0.0003, max_batch_size=64):
+        self.score_batch = score_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._flush_handle = None
+        self.queue_depth = Histogram((1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self.batch_size = Histogram((1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self.queue_depth.observe(len(self._pending))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Hand everything queued so far to a worker thread for scoring"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batch_size.observe(len(batch))
+
+        # Scoring is CPU work; keep it off the event loop so other requests keep flowing
+        scored = asyncio.get_running_loop().run_in_executor(
+            None, self.score_batch, [item for item, _ in batch]
+        )
+        scored.add_done_callback(lambda done: self._resolve(batch, done))
+
+    @staticmethod
+    def _resolve(batch, scored):
+        """Resolve the waiting futures from a finished scoring call"""
+        if scored.cancelled():
+            for _, future in batch:
+                future.cancel()
+            return
+        if scored.exception() is not None:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(scored.exception())
+            return
+
+        for (_, future), result in zip(batch, scored.result()):
+            # A caller may have gone away (cancelled) while queued
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        """Current queue state and histograms for tuning the window"""
+        return {
+            'window_us': round(self.window_seconds * 1e6),
+            'max_batch_size': self.max_batch_size,
+            'queued': len(self._pending),
+            'queue_depth': self.queue_depth.snapshot(),
+            'batch_size': self.batch_size.snapshot(),
+        }
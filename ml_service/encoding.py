@@ -0,0 +1,72 @@
+# encoding.py
+"""
+Response encoding with Accept-header negotiation.
+
+JSON is encoded with orjson when installed (stdlib json otherwise) and
+MessagePack is offered when msgpack is installed. Both are optional: without
+them every response falls back to compact stdlib JSON.
+"""
+import json
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def encode_json(payload) -> bytes:
+    """Compact JSON bytes, matching Starlette's JSONResponse separators"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            # Integers beyond 64 bits, which only the stdlib encoder handles
+            pass
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def encode_msgpack(payload) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+def accept_quality(accept: str, media_types) -> float:
+    """Highest q-value the Accept header gives any of media_types"""
+    best = 0.0
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        if media_type not in media_types:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        best = max(best, quality)
+    return best
+
+def negotiate(accept: str) -> str:
+    """Pick the response media type for an Accept header (JSON unless MessagePack is preferred)"""
+    if msgpack is None or not accept:
+        return JSON_MEDIA_TYPE
+    msgpack_quality = accept_quality(accept, MSGPACK_MEDIA_TYPES)
+    json_quality = accept_quality(accept, (JSON_MEDIA_TYPE, "application/*", "*/*"))
+    return MSGPACK_MEDIA_TYPE if msgpack_quality > json_quality else JSON_MEDIA_TYPE
+
+def negotiated_response(accept: str, payload) -> Response:
+    """Encode payload in the format the client asked for"""
+    media_type = negotiate(accept)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = encode_msgpack(payload)
+    else:
+        body = encode_json(payload)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
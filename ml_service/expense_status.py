@@ -0,0 +1,68 @@
+# expense_status.py
+"""
+Status logic shared by serve.py and the offline scorer (score_offline.py).
+
+generate_status() is the per-record form used by /predict, status_codes()
+the vectorized form used for batches; both pick the same STATUS_TEMPLATES
+entry for the same inputs.
+"""
+import numpy as np
+
+# Constants for status logic
+SAVINGS_THRESHOLD = -500
+BALANCE_THRESHOLD = 300
+MISC_HIGH_THRESHOLD = 4000
+STATUS_RANGE = (-500, 500)
+
+# Status message templates, indexed by the category computed in status_codes()
+STATUS_TEMPLATES = (
+    "Your income is {income}. Your expenses are less. Congrats you saved {savings:.0f}.",
+    "Your income is {income}. Your expenses are less. However you are spending more on miscellaneous items. You saved {savings:.0f}.",
+    "Your income is {income}. Your expenses are balanced. However you are spending more on miscellaneous items. You saved {savings:.0f}.",
+    "Your income is {income}. Your expenses are balanced. You save {savings:.0f}.",
+    "Your expenses for this month are a bit higher. Your income is {income}. You save {savings:.0f}.",
+)
+
+# Human-readable labels for the breakdown echoed back in responses
+BREAKDOWN_LABELS = {
+    'house_rent': "House Rent",
+    'food_costs': "Food",
+    'electricity': "Electricity",
+    'gas': "Gas",
+    'water': "Water",
+    'misc': "Misc",
+}
+
+def generate_status(income: int, actual: float, baseline: float, misc: int) -> str:
+    """Generate status message based on expense analysis"""
+    diff = actual - baseline
+    savings = income - actual
+
+    # Optimized status generation with clearer logic
+    if diff < SAVINGS_THRESHOLD:
+        if misc <= MISC_HIGH_THRESHOLD:
+            code = 0
+        else:
+            code = 1
+
+    elif diff < BALANCE_THRESHOLD and misc > MISC_HIGH_THRESHOLD:
+        code = 2
+
+    elif STATUS_RANGE[0] < diff < STATUS_RANGE[1] and misc <= MISC_HIGH_THRESHOLD:
+        code = 3
+
+    else:
+        code = 4
+
+    return STATUS_TEMPLATES[code].format(income=income, savings=savings)
+
+def status_codes(diff: np.ndarray, misc: np.ndarray) -> np.ndarray:
+    """Vectorized equivalent of the branches in generate_status()"""
+    misc_high = misc > MISC_HIGH_THRESHOLD
+    conditions = [
+        (diff < SAVINGS_THRESHOLD) & ~misc_high,
+        diff < SAVINGS_THRESHOLD,
+        (diff < BALANCE_THRESHOLD) & misc_high,
+        (diff > STATUS_RANGE[0]) & (diff < STATUS_RANGE[1]) & ~misc_high,
+    ]
+    return np.select(conditions, [0, 1, 2, 3], default=4)
@@ -0,0 +1,167 @@
+# sampling_profiler.py
+"""
+On-demand stack-sampling profiler for a live process.
+
+StackSampler runs in its own thread for the requested time and, hz times a
+second, reads every other thread's Python stack from sys._current_frames().
+Identical stacks are counted and returned in the collapsed format
+("thread;outer (file:line);...;inner (file:line) count") understood by
+flamegraph.pl and speedscope, or rendered directly by flame_graph_svg().
+
+Nothing is installed in the interpreter (no tracing or profiling hooks), so
+the process runs at full speed whenever no profile is being taken; while
+sampling, the cost is one stack walk per thread per sample. Only one profile
+runs at a time.
+
+Both services ship their own copy of this module (Hackodisha/ and
+ml_service/ are built into separate images); keep them identical.
+"""
+import hmac
+import html
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+# Leaf frames of threads that are blocked rather than working; their
+# samples are left out unless include_idle is set
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('socket.py', 'accept'),
+    ('socketserver.py', 'serve_forever'),
+}
+
+class ProfileInProgress(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+def token_matches(expected, authorization):
+    """Whether an 'Authorization: Bearer <token>' header value carries the expected token"""
+    scheme, _, token = (authorization or '').partition(' ')
+    return bool(expected) and scheme.lower() == 'bearer' and hmac.compare_digest(token.strip(), expected)
+
+_running = threading.Lock()
+
+def _thread_label(name):
+    # Pool threads differ only by number ("Thread-12 (...)", "ThreadPoolExecutor-0_3"); merge them
+    return re.sub(r'\d+', 'N', name).replace(';', ':')
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Background thread counting the stacks of every other thread"""
+
+    def __init__(self, hz=100, include_idle=False, ignore_threads=()):
+        self.interval = 1.0 / hz
+        self.include_idle = include_idle
+        self.ignore = set(ignore_threads)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not _running.acquire(blocking=False):
+            raise ProfileInProgress("a profile is already running")
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        _running.release()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            names = {thread.ident: _thread_label(thread.name) for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own or ident in self.ignore:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f'thread-{ident}'))
+                self.stacks[';'.join(reversed(labels))] += 1
+            # Do not keep other threads' frames alive between samples
+            frames = frame = None
+            self.samples += 1
+            next_sample += self.interval
+            self._stop.wait(max(0.0, next_sample - time.perf_counter()))
+
+def profile(seconds, hz=100, include_idle=False):
+    """Sample every thread but the caller for seconds; returns (stacks Counter, samples taken)"""
+    sampler = StackSampler(hz, include_idle, ignore_threads=[threading.get_ident()]).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        stacks = sampler.stop()
+    return stacks, sampler.samples
+
+def collapsed(stacks):
+    """Collapsed-stack text, most frequent stacks first"""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def flame_graph_svg(stacks, title='Flame graph', width=1200, row_height=16):
+    """Self-contained flame graph (root at the bottom); hover a frame for its sample count"""
+    # Merge the stacks into a tree: label -> [count, children]
+    root = [0, {}]
+    for stack, count in stacks.items():
+        root[0] += count
+        node = root
+        for label in stack.split(';'):
+            node = node[1].setdefault(label, [0, {}])
+            node[0] += count
+
+    def depth(node):
+        return 1 + max((depth(child) for child in node[1].values()), default=0)
+
+    total = max(root[0], 1)
+    levels = depth(root) - 1
+    top = 2 * row_height
+    height = top + max(levels, 1) * row_height + row_height
+    scale = (width - 20) / total
+    rects = []
+
+    def draw(node, x, level):
+        for label, child in sorted(node[1].items()):
+            w = child[0] * scale
+            if w >= 0.5:
+                y = height - row_height - (level + 1) * row_height
+                hue = zlib.crc32(label.split(' (')[0].encode()) % 50
+                text = html.escape(label)
+                tooltip = f"{text} — {child[0]} samples ({100 * child[0] / total:.1f}%)"
+                chars = int(w / 7)
+                shown = text if len(label) <= chars else (html.escape(label[:chars - 2]) + '..' if chars > 3 else '')
+                rects.append(
+                    f'<g><title>{tooltip}</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" '
+                    f'fill="hsl({hue},85%,{60 + hue % 10}%)" rx="2"/>'
+                    f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{shown}</text></g>'
+                )
+                draw(child, x, level + 1)
+            x += w
+
+    draw(root, 10, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<rect width="100%" height="100%" fill="#fdfdf5"/>'
+        f'<text x="{width / 2}" y="{row_height + 2}" text-anchor="middle" font-size="14">'
+        f'{html.escape(title)} ({root[0]} samples)</text>'
+        + ''.join(rects) + '</svg>'
+    )
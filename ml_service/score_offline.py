@@ -0,0 +1,240 @@
+# score_offline.py
+"""
+Bulk offline scoring of Parquet, Arrow IPC and CSV files with the serve.py model.
+
+The input is read in record batches, each batch is scored vectorized in a
+pool of worker processes and the results are written column-wise in input
+order. Values are identical to the ones /predict returns for the same rows
+(scored against the global model, as /predict does for requests without a
+user_id); the breakdown echo is left out since it repeats the input columns.
+
+Output columns: predicted_baseline, actual_expense, income, savings,
+variance, status_code (index into STATUS_TEMPLATES) and, with --status-text,
+the status message. --keep carries input columns (ids, dates) through.
+
+Usage:
+    python score_offline.py expenses.parquet scored.parquet
+    python score_offline.py history.csv scored.arrow --workers 8 --keep account_id month
+    python score_offline.py history.csv scored.csv --status-text
+
+The format is picked from the file extension (.parquet/.pq, .arrow/.feather/.ipc,
+.csv). Parquet and Arrow need pyarrow; CSV only needs pandas.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from baseline_model import (
+    DEFAULT_ARTIFACT_PATH,
+    DEFAULT_STATS_PATH,
+    FEATURE_COLUMNS,
+    BaselineModel,
+    load_current_model,
+)
+from expense_status import STATUS_TEMPLATES, status_codes
+
+FORMATS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.csv': 'csv',
+}
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported file type {extension!r} for {path} (expected one of {sorted(FORMATS)})")
+    file_type = FORMATS[extension]
+    if file_type != 'csv' and pa is None:
+        raise ValueError(f"Reading or writing {file_type} files requires pyarrow")
+    return file_type
+
+def read_batches(path, columns, batch_size):
+    """DataFrames of at most batch_size rows holding just `columns`"""
+    file_type = file_format(path)
+    if file_type == 'csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=batch_size)
+        return
+
+    if file_type == 'parquet':
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+    else:
+        try:
+            reader = pa.ipc.open_file(path)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            # Not the random-access file format, so try the streaming one
+            batches = pa.ipc.open_stream(pa.memory_map(path))
+
+    for batch in batches:
+        # IPC files keep the writer's batch sizes, which can be arbitrarily large
+        for offset in range(0, batch.num_rows, batch_size):
+            yield batch.slice(offset, batch_size).select(columns).to_pandas()
+
+class BatchWriter:
+    """Appends scored DataFrames to one output file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file_type = file_format(path)
+        self._writer = None
+        self._sink = None
+
+    def write(self, frame):
+        if self.file_type == 'csv':
+            frame.to_csv(self.path, mode='w' if self._writer is None else 'a',
+                         header=self._writer is None, index=False)
+            self._writer = True
+            return
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            if self.file_type == 'parquet':
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._sink = pa.OSFile(self.path, 'wb')
+                self._writer = pa.ipc.new_file(self._sink, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self.file_type != 'csv' and self._writer is not None:
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+
+def feature_matrix(frame, first_row):
+    """int64 feature matrix in FEATURE_COLUMNS order, rejecting what /predict would reject"""
+    columns = []
+    for name in FEATURE_COLUMNS:
+        values = frame[name].to_numpy()
+        if frame[name].isna().any():
+            row = first_row + int(np.flatnonzero(frame[name].isna().to_numpy())[0])
+            raise ValueError(f"Missing {name} at row {row}")
+        if values.dtype.kind == 'f':
+            fractional = values != np.floor(values)
+            if fractional.any():
+                row = first_row + int(np.flatnonzero(fractional)[0])
+                raise ValueError(f"Non-integer {name} at row {row}: {values[fractional][0]}")
+        elif values.dtype.kind not in 'iub':
+            raise ValueError(f"Column {name} must be numeric, got {values.dtype}")
+        columns.append(values.astype(np.int64))
+    return np.column_stack(columns)
+
+def score_frame(model, frame, first_row, status_text=False, keep=()):
+    """Score one batch: the same values /predict computes, one column per field"""
+    X = feature_matrix(frame, first_row)
+    baseline = model.predict(X)
+
+    # FEATURE_COLUMNS is income followed by the expense columns
+    actual = X[:, 1:].sum(axis=1)
+    income = X[:, 0]
+    savings = income - actual
+    codes = status_codes(actual - baseline, X[:, FEATURE_COLUMNS.index('misc')])
+
+    # Python's round() per value as in /predict; np.round can differ in the last digit
+    baseline_values = baseline.tolist()
+    scored = {name: frame[name].to_numpy() for name in keep}
+    scored['predicted_baseline'] = np.array([round(value, 2) for value in baseline_values])
+    scored['actual_expense'] = actual
+    scored['income'] = income
+    scored['savings'] = savings
+    scored['variance'] = np.array([
+        round(actual_expense - value, 2)
+        for actual_expense, value in zip(actual.tolist(), baseline_values)
+    ])
+    scored['status_code'] = codes
+    if status_text:
+        scored['status'] = [
+            STATUS_TEMPLATES[code].format(income=row_income, savings=saved)
+            for code, row_income, saved in zip(codes.tolist(), income.tolist(), savings.tolist())
+        ]
+    return pd.DataFrame(scored)
+
+# Per-process model, installed by the pool initializer
+_worker_model = None
+
+def _init_worker(model_dict):
+    global _worker_model
+    _worker_model = BaselineModel.from_dict(model_dict)
+
+def _score_in_worker(frame, first_row, status_text, keep):
+    return score_frame(_worker_model, frame, first_row, status_text, keep)
+
+def score_file(model, input_path, output_path, batch_size=100000, workers=None,
+               status_text=False, keep=()):
+    """Score input_path into output_path; returns the number of rows written"""
+    keep = list(keep)
+    columns = keep + [name for name in FEATURE_COLUMNS if name not in keep]
+    batches = read_batches(input_path, columns, batch_size)
+    writer = BatchWriter(output_path)
+    workers = workers or os.cpu_count() or 1
+    rows = 0
+
+    try:
+        if workers == 1:
+            for frame in batches:
+                writer.write(score_frame(model, frame, rows, status_text, keep))
+                rows += len(frame)
+            return rows
+
+        # Only a few batches in flight per worker, so memory stays bounded
+        # however large the input is; results are written in input order
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(model.to_dict(),)) as pool:
+            pending = deque()
+            for frame in batches:
+                pending.append(pool.submit(_score_in_worker, frame, rows, status_text, keep))
+                rows += len(frame)
+                if len(pending) >= workers * 2:
+                    writer.write(pending.popleft().result())
+            while pending:
+                writer.write(pending.popleft().result())
+        return rows
+    finally:
+        writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Score expense records offline with the serve.py model")
+    parser.add_argument('input', help="Parquet, Arrow IPC or CSV file with the FEATURE_COLUMNS")
+    parser.add_argument('output', help="file to write, format picked from its extension")
+    parser.add_argument('--batch-size', type=int, default=100000, help="rows per record batch")
+    parser.add_argument('--workers', type=int, default=None, help="scoring processes (default: all cores)")
+    parser.add_argument('--status-text', action='store_true', help="also write the status message")
+    parser.add_argument('--keep', nargs='+', default=[], metavar='COLUMN',
+                        help="input columns to copy into the output")
+    parser.add_argument('--model', default=os.getenv("BASELINE_MODEL_PATH", DEFAULT_ARTIFACT_PATH),
+                        help="model artifact (default: same as serve.py)")
+    parser.add_argument('--stats', default=os.getenv("BASELINE_STATS_PATH", DEFAULT_STATS_PATH),
+                        help="online statistics to refit from, as serve.py does at startup")
+    args = parser.parse_args()
+
+    model, _ = load_current_model(args.model, args.stats)
+    start = time.perf_counter()
+    try:
+        rows = score_file(model, args.input, args.output, args.batch_size, args.workers,
+                          args.status_text, args.keep)
+    except (ValueError, KeyError) as e:
+        print(f"Scoring failed: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} rows into {args.output} in {elapsed:.1f}s "
+          f"({rows / max(elapsed, 1e-9):,.0f} rows/s, model {model.model_version})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
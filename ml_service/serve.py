@@ -1,12 +1,37 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 import uvicorn
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
 import os
+import json
+import threading
+from operator import attrgetter
 from fastapi.middleware.cors import CORSMiddleware
+from coalescer import BatchCoalescer
+from encoding import encode_json, negotiated_response
+from expense_status import BREAKDOWN_LABELS, STATUS_TEMPLATES, generate_status, status_codes
+from metrics import NULL_CLOCK, Metrics, MetricsMiddleware
+import sampling_profiler
+from tracing import Tracer, TracingMiddleware
+from user_baselines import UserBaselineStore
+from baseline_model import (
+    DEFAULT_ARTIFACT_PATH,
+    DEFAULT_STATS_PATH,
+    EXPENSE_COLUMNS,
+    FEATURE_COLUMNS,
+    fit_from_stats,
+    load_current_model,
+    observation_arrays,
+    online_model_path,
+    save_artifact,
+    save_stats,
+    seed_stats,
+)
 
 # Initialize app first
 app = FastAPI(
@@ -24,69 +49,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Training data
-data = {
-    'income': [31000, 26000, 28000, 27000, 29563, 30236, 31692, 30699],
-    'house_rent': [3000, 3000, 3100, 3200, 3150, 3060, 3111, 3015],
-    'food_costs': [9000, 8650, 7520, 9263, 8523, 7532, 9512, 9632],
-    'electricity': [600, 650, 625, 693, 450, 423, 582, 601],
-    'gas': [820, 825, 862, 851, 810, 810, 821, 875],
-    'water': [400, 450, 420, 440, 430, 420, 430, 440],
-    'misc': [3020, 2220, 2210, 2230, 1215, 3275, 2246, 2278],
-}
-
-# Feature columns for efficiency
-EXPENSE_COLUMNS = ['house_rent', 'food_costs', 'electricity', 'gas', 'water', 'misc']
-FEATURE_COLUMNS = ['income'] + EXPENSE_COLUMNS
-
-# Prepare DataFrame and calculate baseline
-df = pd.DataFrame(data)
-df['baseline_expense'] = df[EXPENSE_COLUMNS].sum(axis=1)
-
-# Train model once at startup
-def train_model():
-    """Train the linear regression model with optimized parameters"""
-    X = df[FEATURE_COLUMNS]
-    y = df['baseline_expense']
-    
-    # Using 80-20 split with fixed random state for reproducibility
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
-    
-    # Initialize and train model
-    model = LinearRegression()
-    model.fit(X_train, y_train)
-    
-    # Calculate training score for monitoring
-    train_score = model.score(X_train, y_train)
-    test_score = model.score(X_test, y_test)
-    print(f"Model trained - Train R²: {train_score:.4f}, Test R²: {test_score:.4f}")
-    
-    return model
+# Spans for each request and its stages, appended to TRACE_DIR (disabled when unset)
+# and stitched across services by trace_report.py
+tracer = Tracer(
+    "ml_service",
+    os.getenv("TRACE_DIR", ""),
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", 1.0)),
+)
 
-# Train model at startup
-model = train_model()
+# Request counts, error rates and per-stage timings, exposed on /metrics
+metrics = Metrics("expense_service", tracer=tracer)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+# Outermost, so the server span covers the whole request
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Load the pre-trained baseline (falls back to training when no artifact exists).
+# Observations posted to /observations are kept as sufficient statistics on
+# disk, so a restart refits from them instead of replaying history
+MODEL_PATH = os.getenv("BASELINE_MODEL_PATH", DEFAULT_ARTIFACT_PATH)
+STATS_PATH = os.getenv("BASELINE_STATS_PATH", DEFAULT_STATS_PATH)
+REFIT_EVERY = int(os.getenv("REFIT_EVERY", 100))
+model, online_stats = load_current_model(MODEL_PATH, STATS_PATH)
+if online_stats is None:
+    online_stats = seed_stats(model)
+refit_lock = threading.Lock()
+observations_since_refit = 0
+
+# Per-user rolling baselines; users without enough history use the global model
+user_baselines = UserBaselineStore(
+    capacity=int(os.getenv("USER_BASELINE_CAPACITY", 100000)),
+    spill_path=os.getenv(
+        "USER_BASELINE_SPILL_PATH",
+        os.path.join(os.path.dirname(STATS_PATH), "user_baselines.sqlite3"),
+    ),
+    alpha=float(os.getenv("USER_BASELINE_ALPHA", 0.3)),
+    min_observations=int(os.getenv("USER_BASELINE_MIN_OBSERVATIONS", 3)),
+)
 
 # Environment variables
+# Bearer token for /observations and /model/refit (disabled at the default)
 ML_SECRET_KEY = os.getenv("ML_SECRET_KEY", "default_secret")
 PORT = int(os.getenv("PORT", 8080))
 
-# Constants for status logic
-SAVINGS_THRESHOLD = -500
-BALANCE_THRESHOLD = 300
-MISC_HIGH_THRESHOLD = 4000
-STATUS_RANGE = (-500, 500)
+# Optional micro-batching of concurrent /predict calls
+PREDICT_COALESCING = os.getenv("PREDICT_COALESCING", "false").lower() in ("1", "true", "yes")
+COALESCE_WINDOW_US = int(os.getenv("COALESCE_WINDOW_US", 300))
+COALESCE_MAX_BATCH = int(os.getenv("COALESCE_MAX_BATCH", 64))
+
+# NDJSON streaming: records scored per chunk and the longest accepted line
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 1000))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", 65536))
+
+# /debug/profile is enabled only when a token is set; requests must send
+# "Authorization: Bearer <token>"
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", 60))
+
+# Largest accepted amount: the sum of every field must fit the int64 feature
+# matrix (and stay exact as a float64); larger values get a 422
+MAX_AMOUNT = 10**15
 
 class InputData(BaseModel):
     """Input data model with validation"""
-    income: int
-    house_rent: int
-    food_costs: int
-    electricity: int
-    gas: int
-    water: int
-    misc: int
+    income: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    house_rent: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    food_costs: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    electricity: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    gas: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    water: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    misc: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+    user_id: Optional[str] = None
     
     class Config:
         schema_extra = {
@@ -101,26 +133,70 @@ class InputData(BaseModel):
             }
         }
 
-def generate_status(income: int, actual: float, baseline: float, misc: int) -> str:
-    """Generate status message based on expense analysis"""
-    diff = actual - baseline
-    savings = income - actual
+class Observation(InputData):
+    """A scored month together with what the user actually spent"""
+    observed_expense: int = Field(..., ge=-MAX_AMOUNT, le=MAX_AMOUNT)
+
+def score_records(data_list: list[InputData], compact: bool = False, clock=NULL_CLOCK) -> list[dict]:
+    """
+    Score many records with a single matrix product
     
-    # Optimized status generation with clearer logic
-    if diff < SAVINGS_THRESHOLD:
-        if misc <= MISC_HIGH_THRESHOLD:
-            return f"Your income is {income}. Your expenses are less. Congrats you saved {savings:.0f}."
-        else:
-            return f"Your income is {income}. Your expenses are less. However you are spending more on miscellaneous items. You saved {savings:.0f}."
+    Produces exactly the same dictionaries as predict(), but builds one
+    feature matrix for the whole batch and only formats strings at the end.
+    With compact=True the status text and breakdown echo are replaced by the
+    numeric status_code (the index into STATUS_TEMPLATES).
+    """
+    if not data_list:
+        return []
     
-    elif diff < BALANCE_THRESHOLD and misc > MISC_HIGH_THRESHOLD:
-        return f"Your income is {income}. Your expenses are balanced. However you are spending more on miscellaneous items. You saved {savings:.0f}."
+    get_features = attrgetter(*FEATURE_COLUMNS)
+    X = np.array([get_features(data) for data in data_list], dtype=np.int64)
+    clock.lap("feature_matrix")
     
-    elif STATUS_RANGE[0] < diff < STATUS_RANGE[1] and misc <= MISC_HIGH_THRESHOLD:
-        return f"Your income is {income}. Your expenses are balanced. You save {savings:.0f}."
+    # A single read of the global model, so a concurrent refit swap cannot mix
+    # coefficients from two versions
+    baseline = model.predict(X)
+    clock.lap("model_predict")
     
-    else:
-        return f"Your expenses for this month are a bit higher. Your income is {income}. You save {savings:.0f}."
+    # Users with an established rolling baseline get it instead of the global one
+    sources = [None] * len(data_list)
+    for i, data in enumerate(data_list):
+        if data.user_id is not None:
+            personal = user_baselines.lookup(data.user_id)
+            sources[i] = "global" if personal is None else "user"
+            if personal is not None:
+                baseline[i] = personal
+    clock.lap("user_baselines")
+    
+    # FEATURE_COLUMNS is income followed by the expense columns
+    actual = X[:, 1:].sum(axis=1)
+    income = X[:, 0]
+    savings = income - actual
+    codes = status_codes(actual - baseline, X[:, FEATURE_COLUMNS.index('misc')])
+    clock.lap("status")
+    
+    labels = [BREAKDOWN_LABELS[col] for col in EXPENSE_COLUMNS]
+    results = []
+    for row, baseline_pred, actual_expense, saved, code, source in zip(
+        X.tolist(), baseline.tolist(), actual.tolist(), savings.tolist(), codes.tolist(), sources
+    ):
+        result = {
+            "predicted_baseline": round(baseline_pred, 2),
+            "actual_expense": actual_expense,
+            "income": row[0],
+            "savings": saved,
+            "variance": round(actual_expense - baseline_pred, 2),
+        }
+        if compact:
+            result["status_code"] = code
+        else:
+            result["breakdown"] = dict(zip(labels, row[1:]))
+            result["status"] = STATUS_TEMPLATES[code].format(income=row[0], savings=saved)
+        if source is not None:
+            result["baseline_source"] = source
+        results.append(result)
+    clock.lap("format")
+    return results
 
 @app.get("/")
 async def root():
@@ -130,16 +206,19 @@ async def root():
 @app.get("/model/info")
 async def model_info():
     """Get model information"""
+    current = model
     return {
         "model_type": "LinearRegression",
+        "model_version": current.model_version,
+        "trained_at": current.trained_at,
         "features": FEATURE_COLUMNS,
-        "training_samples": len(df),
-        "coefficients": dict(zip(FEATURE_COLUMNS, model.coef_)),
-        "intercept": model.intercept_
+        "training_samples": current.training_stats.get('training_samples'),
+        "training_stats": current.training_stats,
+        "coefficients": dict(zip(FEATURE_COLUMNS, current.coef_)),
+        "intercept": current.intercept_
     }
 
-@app.post("/predict")
-def predict(data: InputData):
+def predict(data: InputData, clock=NULL_CLOCK):
     """
     Predict baseline expense and analyze spending patterns
     
@@ -150,11 +229,22 @@ def predict(data: InputData):
         - breakdown: Detailed expense breakdown
         - status: Analysis message
     """
+    clock.lap("dispatch")
+    
     # Efficiently create feature DataFrame
     features = pd.DataFrame([data.dict()])
+    clock.lap("dataframe")
     
-    # Get prediction
+    # Get prediction, preferring the user's own rolling baseline when established
     baseline_pred = float(model.predict(features[FEATURE_COLUMNS])[0])
+    clock.lap("model_predict")
+    baseline_source = None
+    if data.user_id is not None:
+        personal = user_baselines.lookup(data.user_id)
+        baseline_source = "global" if personal is None else "user"
+        if personal is not None:
+            baseline_pred = personal
+    clock.lap("user_baselines")
     
     # Calculate actual expense efficiently
     expense_data = data.dict()
@@ -169,6 +259,7 @@ def predict(data: InputData):
         baseline_pred, 
         data.misc
     )
+    clock.lap("status")
     
     # Create breakdown dictionary
     breakdown = {
@@ -180,7 +271,7 @@ def predict(data: InputData):
         "Misc": data.misc
     }
     
-    return {
+    result = {
         "predicted_baseline": round(baseline_pred, 2),
         "actual_expense": actual_expense,
         "income": data.income,
@@ -189,22 +280,296 @@ def predict(data: InputData):
         "breakdown": breakdown,
         "status": status
     }
+    if baseline_source is not None:
+        result["baseline_source"] = baseline_source
+    clock.lap("format")
+    return result
+
+def score_coalesced_batch(items: list[tuple[InputData, bool]]) -> list[dict]:
+    """Score one coalesced batch of (record, compact) /predict calls, timing its stages"""
+    # Shared by several requests, so not attributed to any one trace
+    clock = metrics.clock("/predict (coalesced batch)", traced=False)
+    results = [None] * len(items)
+    for compact in (False, True):
+        indices = [i for i, (_, item_compact) in enumerate(items) if item_compact == compact]
+        if indices:
+            scored = score_records([items[i][0] for i in indices], compact=compact, clock=clock)
+            for i, result in zip(indices, scored):
+                results[i] = result
+    return results
+
+coalescer = (
+    BatchCoalescer(score_coalesced_batch, COALESCE_WINDOW_US / 1e6, COALESCE_MAX_BATCH)
+    if PREDICT_COALESCING else None
+)
+if coalescer is not None:
+    metrics.register_histogram(
+        "coalescer_queue_depth", "Queued /predict calls when each call was enqueued", coalescer.queue_depth
+    )
+    metrics.register_histogram(
+        "coalescer_batch_size", "Records per coalesced /predict batch", coalescer.batch_size
+    )
+
+@app.post("/predict")
+async def predict_endpoint(data: InputData, request: Request, compact: bool = False):
+    """
+    Predict baseline expense and analyze spending patterns
+    
+    Responds with JSON, or MessagePack when the Accept header prefers
+    application/msgpack. compact=true drops the status text and breakdown
+    echo and returns status_code instead, for machine clients.
+    """
+    clock = metrics.clock("/predict", request.scope.get("metrics_start_ns"))
+    clock.lap("parse_validate")
+    if coalescer is not None:
+        # Queue with concurrent /predict calls and score them as one batch
+        result = await coalescer.submit((data, compact))
+        clock.lap("coalesced_wait")
+    elif compact:
+        result = (await run_in_threadpool(score_records, [data], True, clock))[0]
+    else:
+        result = await run_in_threadpool(predict, data, clock)
+    response = negotiated_response(request.headers.get("accept", ""), result)
+    clock.lap("serialization")
+    return response
+
+@app.get("/predict/coalescer")
+async def coalescer_stats():
+    """Queue depth and batch-size histograms for tuning the coalescing window"""
+    if coalescer is None:
+        return {"enabled": False}
+    return {"enabled": True, **coalescer.stats()}
 
 @app.post("/batch_predict")
-def batch_predict(data_list: list[InputData]):
+def batch_predict(data_list: list[InputData], request: Request, compact: bool = False):
     """
     Batch prediction for multiple expense records
     
     Args:
         data_list: List of InputData objects
+        compact: Drop status text and breakdown, returning status_code instead
     
     Returns:
-        List of predictions for each input
+        List of predictions for each input, as JSON or MessagePack depending
+        on the Accept header
     """
-    results = []
-    for data in data_list:
-        results.append(predict(data))
-    return {"predictions": results, "count": len(results)}
+    clock = metrics.clock("/batch_predict", request.scope.get("metrics_start_ns"))
+    clock.lap("parse_validate")
+    results = score_records(data_list, compact=compact, clock=clock)
+    response = negotiated_response(
+        request.headers.get("accept", ""), {"predictions": results, "count": len(results)}
+    )
+    clock.lap("serialization")
+    return response
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body generator consumes the request body itself"""
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        # The default implementation also listens for disconnects on receive(),
+        # which would race the generator for request body chunks. Disconnects
+        # still surface through request.stream() raising ClientDisconnect.
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def require_secret_key(request: Request):
+    """
+    Guard for endpoints that change the served model
+    
+    Callers must send "Authorization: Bearer <ML_SECRET_KEY>". The endpoints
+    are disabled (404) while ML_SECRET_KEY is unset or left at its default.
+    """
+    if ML_SECRET_KEY in ("", "default_secret"):
+        raise HTTPException(status_code=404, detail="Model updates disabled (set ML_SECRET_KEY)")
+    if not sampling_profiler.token_matches(ML_SECRET_KEY, request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Invalid or missing ML_SECRET_KEY")
+
+def refit_model():
+    """Refit from the accumulated statistics and swap the served model (refit_lock held)"""
+    global model, observations_since_refit
+    # Rebinding the global is atomic; in-flight requests finish on the old model
+    model = fit_from_stats(online_stats)
+    observations_since_refit = 0
+    # A restart serves this refit instead of the shipped artifact
+    save_artifact(model, online_model_path(STATS_PATH))
+
+@app.post("/observations", dependencies=[Depends(require_secret_key)])
+def add_observations(data_list: list[Observation]):
+    """
+    Fold observed expense records into the online baseline
+    
+    Each record's observed_expense is used as the baseline target. The model is
+    refit from the accumulated statistics every REFIT_EVERY observations and
+    hot-swapped; /predict keeps serving the previous model meanwhile. Records
+    with a user_id also update that user's rolling baseline. Requires the
+    ML_SECRET_KEY bearer token.
+    """
+    global observations_since_refit
+    refitted = False
+    if data_list:
+        X, y = observation_arrays([data.dict() for data in data_list])
+        for data, observed_expense in zip(data_list, y.tolist()):
+            if data.user_id is not None:
+                user_baselines.observe(data.user_id, observed_expense)
+        with refit_lock:
+            online_stats.update(X, y)
+            observations_since_refit += len(data_list)
+            if observations_since_refit >= REFIT_EVERY and online_stats.can_fit():
+                refit_model()
+                refitted = True
+            save_stats(online_stats, STATS_PATH)
+
+    return {
+        "accepted": len(data_list),
+        "total_observations": online_stats.count,
+        "refitted": refitted,
+        "model_version": model.model_version,
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Request counts, error rates and stage timings in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile")
+async def debug_profile(request: Request, seconds: float = 10, hz: int = 100,
+                        format: str = "collapsed", idle: bool = False):
+    """
+    Sample the stacks of this process for ?seconds=N
+    
+    Returns collapsed stacks (text/plain) or, with format=svg, a flame graph.
+    Sampling runs off the event loop, so the loop keeps serving (and is
+    profiled) meanwhile. idle=true keeps threads that are only waiting.
+    Disabled (404) unless PROFILER_TOKEN is set.
+    """
+    if not PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    if not sampling_profiler.token_matches(PROFILER_TOKEN, request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Invalid or missing profiler token")
+    if not 0 < seconds <= PROFILER_MAX_SECONDS or not 1 <= hz <= 1000 or format not in ("collapsed", "svg"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Use 0 < seconds <= {PROFILER_MAX_SECONDS:g}, 1 <= hz <= 1000 and format collapsed or svg",
+        )
+    
+    try:
+        stacks, _ = await run_in_threadpool(sampling_profiler.profile, seconds, hz, idle)
+    except sampling_profiler.ProfileInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "svg":
+        title = f"Expense Predictor API (pid {os.getpid()}), {seconds:g}s at {hz} Hz"
+        return Response(sampling_profiler.flame_graph_svg(stacks, title), media_type="image/svg+xml")
+    return PlainTextResponse(sampling_profiler.collapsed(stacks))
+
+@app.get("/users/baselines")
+async def user_baseline_stats():
+    """Occupancy and hit/miss/eviction counters of the per-user baseline store"""
+    return user_baselines.stats()
+
+@app.on_event("shutdown")
+def flush_user_baselines():
+    """Persist resident per-user baselines so they survive restarts"""
+    user_baselines.flush()
+
+@app.post("/model/refit", dependencies=[Depends(require_secret_key)])
+def force_refit():
+    """Refit and swap the model now, regardless of REFIT_EVERY"""
+    with refit_lock:
+        if not online_stats.can_fit():
+            raise HTTPException(
+                status_code=409,
+                detail=f"Not enough observations to refit ({online_stats.count} of {online_stats.n_features + 1})",
+            )
+        refit_model()
+    return {"model_version": model.model_version, "training_samples": online_stats.count}
+
+def parse_ndjson_record(line: bytes):
+    """Validate one NDJSON line, returning (record, error message)"""
+    try:
+        return InputData(**json.loads(line)), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+    except (ValueError, TypeError) as e:
+        return None, f"invalid JSON object: {e}"
+
+async def score_ndjson_chunk(entries: list) -> bytes:
+    """Score the valid records of a chunk and encode every entry in input order"""
+    records = [record for _, record, _ in entries if record is not None]
+    clock = metrics.clock("/predict/stream")
+    results = iter(await run_in_threadpool(score_records, records, clock=clock))
+
+    lines = []
+    for line_no, record, error in entries:
+        item = next(results) if record is not None else {"line": line_no, "error": error}
+        lines.append(encode_json(item))
+    return b"\n".join(lines) + b"\n"
+
+async def stream_predictions(request: Request):
+    """Read NDJSON from the request body and yield NDJSON results chunk by chunk"""
+    buffer = b""
+    entries = []
+    line_no = 0
+    skipping_long_line = False
+
+    def handle_line(line: bytes):
+        nonlocal line_no
+        line_no += 1
+        if line.strip():
+            entries.append((line_no, *parse_ndjson_record(line)))
+
+    try:
+        async for body_chunk in request.stream():
+            buffer += body_chunk
+            *lines, buffer = buffer.split(b"\n")
+
+            if skipping_long_line and lines:
+                # The first segment is the tail of a line already reported as too long
+                lines.pop(0)
+                skipping_long_line = False
+
+            for line in lines:
+                handle_line(line)
+
+            if not skipping_long_line and len(buffer) > STREAM_MAX_LINE_BYTES:
+                line_no += 1
+                entries.append((line_no, None, f"line exceeds {STREAM_MAX_LINE_BYTES} bytes"))
+                buffer = b""
+                skipping_long_line = True
+            elif skipping_long_line:
+                buffer = b""
+
+            while len(entries) >= STREAM_CHUNK_SIZE:
+                chunk, entries = entries[:STREAM_CHUNK_SIZE], entries[STREAM_CHUNK_SIZE:]
+                yield await score_ndjson_chunk(chunk)
+    except ClientDisconnect:
+        return
+
+    if buffer and not skipping_long_line:
+        handle_line(buffer)
+    if entries:
+        yield await score_ndjson_chunk(entries)
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Streaming prediction for newline-delimited JSON expense records
+    
+    Each input line is an InputData object. Records are validated and scored
+    in chunks of STREAM_CHUNK_SIZE and results are streamed back as NDJSON in
+    input order, so memory stays bounded regardless of input size. Lines that
+    fail validation produce {"line": n, "error": ...} instead of a prediction.
+    
+    Results start flowing before the upload finishes, so clients sending large
+    bodies must read the response while still writing (e.g. curl -T - or an
+    async HTTP client); a client that only reads after sending will stall once
+    the socket buffers fill.
+    """
+    return NDJSONStreamingResponse(stream_predictions(request))
 
 if __name__ == "__main__":
     # Use environment PORT with proper configuration
@@ -0,0 +1,236 @@
+# tracing.py
+"""
+Cross-service request tracing with a file-based collector.
+
+A request's trace id travels in the W3C traceparent header
+("00-<32 hex trace id>-<16 hex parent span id>-<flags>"); the front end
+sets it on its calls to both services. Each service opens a server span
+per request (continuing the caller's trace, or starting one), records its
+internal stages as child spans, and answers with the trace id in
+X-Trace-ID.
+
+Finished spans are queued and appended by a background thread, as JSON
+lines, to spans-<service>-<pid>.jsonl in the trace directory (one file per
+process, so forked workers never interleave). trace_report.py at the
+repository root stitches the files of all services into per-request
+waterfalls and percentile breakdowns.
+
+With no trace directory the tracer is disabled and costs one attribute
+check per request. Whether a trace is recorded is decided once, where it
+starts: the caller's sampled flag is honoured, otherwise sample_rate
+applies.
+
+Both services ship their own copy of this module (Hackodisha/ and
+ml_service/ are built into separate images); keep them identical.
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current = contextvars.ContextVar('current_span', default=None)
+
+def parse_traceparent(header):
+    """(trace id, parent span id, sampled) from a traceparent header, or None"""
+    match = TRACEPARENT_PATTERN.match((header or '').strip().lower())
+    if match is None or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+def _new_id(n_bytes):
+    return os.urandom(n_bytes).hex()
+
+class Span:
+    """Server span of one request; stages are recorded as its children"""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'sampled',
+                 'start_ns', 'attributes', '_token')
+
+    def __init__(self, tracer, trace_id, parent_id, name, sampled, attributes):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.sampled = sampled
+        self.start_ns = time.perf_counter_ns()
+        self.attributes = attributes
+        self._token = None
+
+    @property
+    def traceparent(self):
+        """Header value continuing this trace from this span"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def record_stage(self, name, start_ns, end_ns, attributes=None):
+        """Record a finished child span timed with time.perf_counter_ns()"""
+        self.tracer.export(self.trace_id, _new_id(8), self.span_id, name, start_ns, end_ns, attributes)
+
+class Tracer:
+    """Creates server spans and hands finished spans to the file exporter"""
+
+    def __init__(self, service, directory='', sample_rate=1.0, queue_size=10000, flush_interval=1.0):
+        self.service = service
+        self.directory = directory
+        self.enabled = bool(directory)
+        self.sample_rate = sample_rate
+        self.exporter = FileSpanExporter(directory, service, queue_size, flush_interval) if self.enabled else None
+
+    def start_request(self, name, traceparent=None, **attributes):
+        """Open the server span for a request and make it current; None when disabled"""
+        if not self.enabled:
+            return None
+        parent = parse_traceparent(traceparent)
+        if parent is None:
+            trace_id, parent_id = _new_id(16), None
+            sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        else:
+            trace_id, parent_id, sampled = parent
+        span = Span(self, trace_id, parent_id, name, sampled, attributes)
+        span._token = _current.set(span)
+        return span
+
+    def finish_request(self, span, **attributes):
+        """Close a span from start_request(), recording it if sampled"""
+        if span is None:
+            return
+        if span._token is not None:
+            try:
+                _current.reset(span._token)
+            except ValueError:
+                # Finished from a different context than it was started in
+                _current.set(None)
+            span._token = None
+        if span.sampled:
+            span.attributes.update(attributes)
+            self.export(span.trace_id, span.span_id, span.parent_id, span.name,
+                        span.start_ns, time.perf_counter_ns(), span.attributes)
+
+    def current(self):
+        return _current.get()
+
+    def stage_recorder(self):
+        """record_stage of the current sampled span, or None when there is nothing to record"""
+        span = _current.get()
+        return span.record_stage if span is not None and span.sampled else None
+
+    def export(self, trace_id, span_id, parent_id, name, start_ns, end_ns, attributes=None):
+        self.exporter.submit({
+            'trace_id': trace_id,
+            'span_id': span_id,
+            'parent_id': parent_id,
+            'service': self.service,
+            'name': name,
+            'start_us': (start_ns + self.exporter.wall_offset_ns) // 1000,
+            'duration_us': (end_ns - start_ns) // 1000,
+            'attributes': attributes or {},
+        })
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        return {'enabled': True, 'directory': self.directory, 'sample_rate': self.sample_rate,
+                **self.exporter.stats()}
+
+class FileSpanExporter:
+    """Background thread appending queued spans to spans-<service>-<pid>.jsonl"""
+
+    def __init__(self, directory, service, queue_size=10000, flush_interval=1.0):
+        self.directory = directory
+        self.service = service
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        # Converts perf_counter_ns() readings to wall-clock time for the files
+        self.wall_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.dropped = 0
+        self.written = 0
+        self._start()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"spans-{self.service}-{os.getpid()}.jsonl")
+        self._queue = queue.Queue(self.queue_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+
+    def submit(self, span):
+        """Queue a span; dropped (and counted) instead of blocking when the queue is full"""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        spans = []
+        while True:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if spans:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(span, separators=(',', ':')) + '\n' for span in spans))
+            self.written += len(spans)
+
+    def stop(self):
+        """Write out queued spans and stop the thread"""
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        return {'file': self.path, 'queued': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped}
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request
+
+    The span is current while the app handles the request (including
+    threadpool handlers, which inherit the context) and is answered with an
+    X-Trace-ID header.
+    """
+
+    def __init__(self, app, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        span = self.tracer.start_request(
+            scope['method'], headers.get(b'traceparent', b'').decode('latin-1'), path=scope['path']
+        )
+        status = 500
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = list(message.get('headers', [])) + [(b'x-trace-id', span.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # Name by route template (set by the router) to keep names bounded
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            span.name = f"{scope['method']} {route}"
+            self.tracer.finish_request(span, status=status)
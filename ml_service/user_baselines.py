@@ -0,0 +1,230 @@
+# user_baselines.py
+"""
+Per-user rolling expense baselines.
+
+Each user's baseline is an exponentially weighted moving average of their
+observed monthly expense. Resident users live in preallocated NumPy arrays
+indexed through an LRU-ordered dict, so lookups are O(1) regardless of how
+many users exist; least recently used users are spilled to a SQLite file.
+
+Lookups never touch the spill file. The ids it holds are kept in memory, so
+an unknown user is a plain set miss; evicted users wait in memory until a
+background thread writes them out in batches, and a lookup of a spilled user
+answers None (the global model applies) while the same thread pages them
+back in for their next request.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Evicted users held in memory before the writer is woken early
+WRITE_BATCH_SIZE = 1000
+
+class UserBaselineStore:
+    """LRU-managed, array-backed store of per-user baselines with on-disk spill"""
+
+    def __init__(self, capacity=100000, spill_path=None, alpha=0.3, min_observations=3, flush_interval=1.0):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.min_observations = min_observations
+        self.flush_interval = flush_interval
+
+        self._baseline = np.zeros(capacity, dtype=np.float64)
+        self._count = np.zeros(capacity, dtype=np.int32)
+        self._slots = OrderedDict()  # user_id -> slot, least recently used first
+        self._free = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+
+        self._spilled = set()  # user ids with a row in the spill file
+        self._unwritten = {}   # user_id -> (baseline, count), evicted but not yet written
+        self._page_in = set()  # spilled user ids asked for since the writer last ran
+
+        self.spill_path = spill_path
+        self._spill = None
+        # Connections inherited over fork(); never used or closed in the child
+        self._inherited_connections = []
+        if spill_path:
+            self._spill = self._connect()
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS baselines "
+                "(user_id TEXT PRIMARY KEY, baseline REAL NOT NULL, count INTEGER NOT NULL)"
+            )
+            self._spilled.update(row[0] for row in self._spill.execute("SELECT user_id FROM baselines"))
+            # Guards the connection; taken before self._lock, never while holding it
+            self._db_lock = threading.Lock()
+            self._start_writer()
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._after_fork)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spill_loads = 0
+
+    def _connect(self):
+        return sqlite3.connect(self.spill_path, check_same_thread=False)
+
+    def _start_writer(self):
+        self._wake = threading.Event()
+        self._writer = threading.Thread(target=self._run_writer, name='user-baseline-writer', daemon=True)
+        self._writer.start()
+
+    def _after_fork(self):
+        # The parent's writer may have held either lock when it forked
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        # SQLite connections must not cross fork(). Closing the parent's in
+        # the child could disturb the parent's locks and journal, so keep it
+        # referenced (unclosed) and open a fresh one
+        self._inherited_connections.append(self._spill)
+        self._spill = self._connect()
+        self._start_writer()
+
+    def _evict(self):
+        """Free the least recently used slot, queueing its user for the spill file"""
+        user_id, slot = self._slots.popitem(last=False)
+        if self._spill is not None:
+            self._unwritten[user_id] = (float(self._baseline[slot]), int(self._count[slot]))
+            self._spilled.add(user_id)
+            if len(self._unwritten) >= WRITE_BATCH_SIZE:
+                self._wake.set()
+        self.evictions += 1
+        return slot
+
+    def _install(self, user_id, state):
+        slot = self._free.pop() if self._free else self._evict()
+        self._baseline[slot], self._count[slot] = state
+        self._slots[user_id] = slot
+        return slot
+
+    def _resident_slot(self, user_id):
+        """Slot for user_id if it is in memory (resident or awaiting its write), else None"""
+        slot = self._slots.get(user_id)
+        if slot is not None:
+            self._slots.move_to_end(user_id)
+            return slot
+        state = self._unwritten.pop(user_id, None)
+        if state is not None:
+            return self._install(user_id, state)
+        return None
+
+    def _read_rows(self, user_ids):
+        """{user_id: (baseline, count)} from the spill file; caller holds self._db_lock"""
+        rows = {}
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            rows.update(
+                (user_id, (baseline, count))
+                for user_id, baseline, count in self._spill.execute(
+                    f"SELECT user_id, baseline, count FROM baselines WHERE user_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return rows
+
+    def _page_in_rows(self, rows):
+        """Make read rows resident unless the user came back into memory meanwhile"""
+        with self._lock:
+            for user_id, state in rows.items():
+                if user_id not in self._slots and user_id not in self._unwritten:
+                    self._install(user_id, state)
+                    self.spill_loads += 1
+
+    def lookup(self, user_id):
+        """The user's baseline, or None if unknown, not yet established or still on disk"""
+        with self._lock:
+            slot = self._resident_slot(user_id)
+            if slot is None and user_id in self._spilled:
+                self._page_in.add(user_id)
+                self._wake.set()
+            if slot is None or self._count[slot] < self.min_observations:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return float(self._baseline[slot])
+
+    def observe(self, user_id, actual_expense):
+        """Fold one observed monthly expense into the user's rolling baseline"""
+        with self._lock:
+            on_disk = self._resident_slot(user_id) is None and user_id in self._spilled
+        if on_disk:
+            # Observations are not on the prediction path, so read the row here
+            with self._db_lock:
+                self._page_in_rows(self._read_rows([user_id]))
+
+        with self._lock:
+            slot = self._resident_slot(user_id)
+            if slot is None:
+                slot = self._install(user_id, (0.0, 0))
+            if self._count[slot] == 0:
+                self._baseline[slot] = actual_expense
+            else:
+                self._baseline[slot] += self.alpha * (actual_expense - self._baseline[slot])
+            self._count[slot] += 1
+
+    def _write_rows(self, rows):
+        """Write (user_id, (baseline, count)) pairs and commit; caller holds self._db_lock"""
+        self._spill.executemany(
+            "INSERT OR REPLACE INTO baselines VALUES (?, ?, ?)",
+            [(user_id, baseline, count) for user_id, (baseline, count) in rows],
+        )
+        self._spill.commit()
+
+    def _write_unwritten(self):
+        # Snapshot under the connection lock so a flush() cannot be overwritten by older rows
+        with self._db_lock:
+            with self._lock:
+                rows = list(self._unwritten.items())
+            if not rows:
+                return
+            self._write_rows(rows)
+        with self._lock:
+            for user_id, state in rows:
+                # Leave users that were paged in and evicted again meanwhile for the next pass
+                if self._unwritten.get(user_id) is state:
+                    del self._unwritten[user_id]
+
+    def _run_writer(self):
+        """Batch spill writes and page-ins off the request path"""
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._write_unwritten()
+                with self._lock:
+                    user_ids, self._page_in = self._page_in, set()
+                if user_ids:
+                    with self._db_lock:
+                        self._page_in_rows(self._read_rows(user_ids))
+            except sqlite3.Error as e:
+                print(f"User baseline spill failed: {e}")
+
+    def flush(self):
+        """Write every in-memory user to the spill file"""
+        if self._spill is None:
+            return
+        with self._db_lock:
+            with self._lock:
+                rows = list(self._unwritten.items()) + [
+                    (user_id, (float(self._baseline[slot]), int(self._count[slot])))
+                    for user_id, slot in self._slots.items()
+                ]
+                self._unwritten.clear()
+                self._spilled.update(self._slots)
+            self._write_rows(rows)
+
+    def stats(self):
+        return {
+            'resident_users': len(self._slots),
+            'capacity': self.capacity,
+            'spilled_users': len(self._spilled),
+            'unwritten': len(self._unwritten),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'spill_loads': self.spill_loads,
+        }
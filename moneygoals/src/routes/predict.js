@@ -2,6 +2,7 @@ const express = require("express");
 const router = express.Router();
 const axios = require("axios");
 const MonthData = require("../models/MonthData");
+const { startTrace, tracedCall } = require("../tracing");
 
 router.get("/", (req, res) => {
     res.render("input.ejs"); // replace with your actual prediction panel view filename
@@ -15,6 +16,7 @@ const FASTAPI_URL = process.env.ML_URL || "https://ml-service-v5yx.onrender.com/
 const FLASK_URL = "http://127.0.0.1:5000/api/recommendations";
 
 router.post("/", async (req, res) => {
+    const trace = startTrace("POST /predict");
     try {
         // Extract and map form fields
         const income = parseInt(req.body.income || 0, 10);
@@ -47,7 +49,8 @@ router.post("/", async (req, res) => {
                 water,
                 misc
             };
-            const { data: fastResp } = await axios.post(FASTAPI_URL, fastapiPayload, { timeout: 8000 });
+            const { data: fastResp } = await tracedCall(trace, "fastapi /predict", headers =>
+                axios.post(FASTAPI_URL, fastapiPayload, { timeout: 8000, headers }));
             if (fastResp && typeof fastResp.predicted_baseline !== 'undefined') {
                 predictedBaseline = Math.round(fastResp.predicted_baseline);
                 const actualExpense = Math.round(fastResp.actual_expense ?? monthlyExpenses);
@@ -74,7 +77,8 @@ router.post("/", async (req, res) => {
                     dependents: 1,
                     income_stability: 3
                 };
-                const { data } = await axios.post(FLASK_URL, flaskPayload, { timeout: 8000 });
+                const { data } = await tracedCall(trace, "flask /api/recommendations", headers =>
+                    axios.post(FLASK_URL, flaskPayload, { timeout: 8000, headers }));
                 if (data && data.status === "success") mlData = data.data;
             } catch (e) {
                 console.warn("⚠️ Flask insights unavailable:", e.message);
@@ -98,9 +102,12 @@ router.post("/", async (req, res) => {
             status
         });
 
+        const saveSpan = trace.child("mongo save");
         await newMonth.save();
+        saveSpan.end();
 
         // Render result page (attach ML insights if available)
+        const renderSpan = trace.child("render");
         res.render("prediction_result", {
             income,
             actual_expense: monthlyExpenses,
@@ -118,9 +125,12 @@ router.post("/", async (req, res) => {
                 misc: misc || 0
             }
         });
+        renderSpan.end();
+        trace.end({ status: 200 });
     } catch (err) {
         console.error("❌ Error in prediction route:", err);
         res.status(500).send("Prediction service failed");
+        trace.end({ status: 500, error: err.message });
     }
 });
 
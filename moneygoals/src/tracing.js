@@ -0,0 +1,104 @@
+// Request tracing shared with the Python services (see ml_service/tracing.py).
+// Each traced request gets a W3C traceparent that is passed on to FastAPI and
+// Flask; spans are appended as JSON lines to TRACE_DIR for trace_report.py.
+// Tracing is off when TRACE_DIR is unset.
+const crypto = require("crypto");
+const fs = require("fs");
+const path = require("path");
+
+const TRACE_DIR = process.env.TRACE_DIR || "";
+const TRACE_SAMPLE_RATE = parseFloat(process.env.TRACE_SAMPLE_RATE || "1");
+const SERVICE = "moneygoals";
+
+const spanFile = TRACE_DIR ? path.join(TRACE_DIR, `spans-${SERVICE}-${process.pid}.jsonl`) : null;
+if (spanFile) fs.mkdirSync(TRACE_DIR, { recursive: true });
+
+let pending = [];
+let flushTimer = null;
+
+function flush() {
+    flushTimer = null;
+    const lines = pending.join("");
+    pending = [];
+    fs.appendFile(spanFile, lines, err => {
+        if (err) console.warn("⚠️ Could not write trace spans:", err.message);
+    });
+}
+
+// Write out spans still waiting for the timer when the process ends
+process.on("exit", () => {
+    if (pending.length) fs.appendFileSync(spanFile, pending.join(""));
+});
+
+// Converts the monotonic clock to wall-clock microseconds
+const clockOffsetUs = Date.now() * 1000 - Number(process.hrtime.bigint() / 1000n);
+
+function nowUs() {
+    return Number(process.hrtime.bigint() / 1000n) + clockOffsetUs;
+}
+
+function newId(bytes) {
+    return crypto.randomBytes(bytes).toString("hex");
+}
+
+class Span {
+    constructor(traceId, parentId, name, sampled, attributes = {}) {
+        this.traceId = traceId;
+        this.spanId = newId(8);
+        this.parentId = parentId;
+        this.name = name;
+        this.sampled = sampled;
+        this.attributes = attributes;
+        this.startUs = nowUs();
+    }
+
+    child(name, attributes = {}) {
+        return new Span(this.traceId, this.spanId, name, this.sampled, attributes);
+    }
+
+    // Headers continuing the trace from this span in an outgoing call
+    headers() {
+        return {
+            traceparent: `00-${this.traceId}-${this.spanId}-${this.sampled ? "01" : "00"}`,
+            "X-Request-ID": this.traceId
+        };
+    }
+
+    end(attributes = {}) {
+        if (!spanFile || !this.sampled) return;
+        Object.assign(this.attributes, attributes);
+        pending.push(JSON.stringify({
+            trace_id: this.traceId,
+            span_id: this.spanId,
+            parent_id: this.parentId,
+            service: SERVICE,
+            name: this.name,
+            start_us: this.startUs,
+            duration_us: nowUs() - this.startUs,
+            attributes: this.attributes
+        }) + "\n");
+        if (!flushTimer) flushTimer = setTimeout(flush, 1000).unref();
+    }
+}
+
+// Root span of an incoming request; trace ids are generated even when
+// tracing is off so the services can still correlate their logs
+function startTrace(name) {
+    const sampled = Boolean(spanFile) && Math.random() < TRACE_SAMPLE_RATE;
+    return new Span(newId(16), null, name, sampled);
+}
+
+// Time an outgoing call as a child span and pass the trace on in its headers
+async function tracedCall(parent, name, call) {
+    const span = parent.child(name);
+    try {
+        const result = await call(span.headers());
+        span.end({ status: result && result.status });
+        return result;
+    } catch (e) {
+        span.end({ error: e.code || e.message, status: e.response && e.response.status });
+        throw e;
+    }
+}
+
+module.exports = { startTrace, tracedCall };
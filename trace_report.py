@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Stitch the span files written by the services into per-request waterfalls
+and latency breakdowns.
+
+The Node front end (moneygoals), the FastAPI service (ml_service) and the
+Flask advisor (Hackodisha) append spans to spans-<service>-<pid>.jsonl in
+TRACE_DIR when it is set. Spans sharing a trace id belong to one front-end
+request; parent ids link each service's server span to the call that made
+it and stage spans to their request.
+
+Usage:
+    python trace_report.py traces/                   # breakdown + 3 slowest waterfalls
+    python trace_report.py traces/ --slowest 10
+    python trace_report.py traces/ --trace 4bf92f3577b34da6a3ce929d0e0e4736
+    python trace_report.py traces/ --root "POST /predict" --since 15
+
+Start times come from each host's wall clock, so waterfalls of services on
+different machines are only as aligned as their clocks.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+def load_spans(directory, since_minutes=None):
+    """Every span in directory's span files, skipping unreadable lines"""
+    cutoff = (time.time() - since_minutes * 60) * 1e6 if since_minutes else None
+    spans = {}
+    bad_lines = 0
+    for path in sorted(glob.glob(os.path.join(directory, 'spans-*.jsonl'))):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                    key = (span['trace_id'], span['span_id'])
+                    span['end_us'] = span['start_us'] + span['duration_us']
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short by a crash, for example
+                    bad_lines += 1
+                    continue
+                if cutoff is None or span['start_us'] >= cutoff:
+                    spans[key] = span
+    if bad_lines:
+        print(f"⚠️ Skipped {bad_lines} unreadable line(s)")
+    return list(spans.values())
+
+class Trace:
+    """The spans of one trace id, linked into trees"""
+
+    def __init__(self, trace_id, spans):
+        self.trace_id = trace_id
+        self.spans = sorted(spans, key=lambda span: span['start_us'])
+        ids = {span['span_id'] for span in spans}
+        self.children = defaultdict(list)
+        self.roots = []
+        for span in self.spans:
+            if span.get('parent_id') in ids:
+                self.children[span['parent_id']].append(span)
+            else:
+                # The front end's request span, or a service span whose caller was not traced
+                self.roots.append(span)
+        self.start_us = self.spans[0]['start_us']
+        self.duration_us = max(span['end_us'] for span in self.spans) - self.start_us
+        self.name = self.roots[0]['name'] if len(self.roots) == 1 else ' + '.join(
+            sorted({f"{root['service']} {root['name']}" for root in self.roots})
+        )
+
+    def walk(self):
+        """(depth, span) in waterfall order"""
+        stack = [(0, root) for root in reversed(self.roots)]
+        while stack:
+            depth, span = stack.pop()
+            yield depth, span
+            stack.extend((depth + 1, child) for child in reversed(self.children[span['span_id']]))
+
+def build_traces(spans):
+    by_trace = defaultdict(list)
+    for span in spans:
+        by_trace[span['trace_id']].append(span)
+    return [Trace(trace_id, trace_spans) for trace_id, trace_spans in by_trace.items()]
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def ms(microseconds):
+    return microseconds / 1000
+
+def print_waterfall(trace, width=40):
+    services = sorted({span['service'] for span in trace.spans})
+    print(f"\n🔎 Trace {trace.trace_id}  {trace.name}  {ms(trace.duration_us):.1f} ms"
+          f"  ({len(trace.spans)} spans, services: {', '.join(services)})")
+    print(f"   {'start':>9} {'duration':>10}  {'':{width + 2}}  span")
+    scale = width / max(trace.duration_us, 1)
+    for depth, span in trace.walk():
+        offset = span['start_us'] - trace.start_us
+        left = min(int(offset * scale), width - 1)
+        bar = max(1, int(round(span['duration_us'] * scale)))
+        bar = min(bar, width - left)
+        attributes = span.get('attributes') or {}
+        notes = ' '.join(f"{key}={attributes[key]}" for key in ('status', 'error') if key in attributes)
+        print(f"   {ms(offset):>7.1f}ms {ms(span['duration_us']):>8.2f}ms  "
+              f"|{' ' * left}{'█' * bar}{' ' * (width - left - bar)}|  "
+              f"{'  ' * depth}{span['service']}: {span['name']}" + (f"  [{notes}]" if notes else ''))
+
+def print_breakdown(traces):
+    """Per request type: end-to-end percentiles, then every span kind's percentiles and share"""
+    groups = defaultdict(list)
+    for trace in traces:
+        groups[trace.name].append(trace)
+
+    for name, group in sorted(groups.items(), key=lambda item: -len(item[1])):
+        totals = sorted(trace.duration_us for trace in group)
+        print(f"\n📊 {name}: {len(group)} request(s), end to end "
+              f"p50 {ms(percentile(totals, 50)):.1f} ms, p90 {ms(percentile(totals, 90)):.1f} ms, "
+              f"p99 {ms(percentile(totals, 99)):.1f} ms")
+
+        # Durations of each (service, span) kind, summed per request
+        per_kind = defaultdict(lambda: defaultdict(int))
+        depth_of = {}
+        for trace in group:
+            for depth, span in trace.walk():
+                kind = (span['service'], span['name'])
+                per_kind[kind][trace.trace_id] += span['duration_us']
+                depth_of[kind] = min(depth, depth_of.get(kind, depth))
+
+        total_time = sum(totals)
+        print(f"   {'span':<52} {'in':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'share':>7}")
+        order = sorted(per_kind, key=lambda kind: (depth_of[kind], -sum(per_kind[kind].values())))
+        for kind in order:
+            durations = sorted(per_kind[kind].values())
+            label = f"{'  ' * depth_of[kind]}{kind[0]}: {kind[1]}"
+            print(f"   {label[:52]:<52} {len(durations) / len(group):>6.0%} "
+                  f"{ms(percentile(durations, 50)):>9.2f} {ms(percentile(durations, 90)):>9.2f} "
+                  f"{ms(percentile(durations, 99)):>9.2f} {sum(durations) / max(total_time, 1):>7.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Waterfalls and latency breakdowns from the services' span files")
+    parser.add_argument('directory', nargs='?', default=os.environ.get('TRACE_DIR', 'traces'))
+    parser.add_argument('--trace', help="show the waterfall of this trace id only")
+    parser.add_argument('--slowest', type=int, default=3, help="waterfalls of the N slowest requests")
+    parser.add_argument('--root', help="only requests whose root span has this name")
+    parser.add_argument('--since', type=float, help="only spans from the last N minutes")
+    parser.add_argument('--width', type=int, default=40, help="waterfall bar width")
+    args = parser.parse_args()
+
+    spans = load_spans(args.directory, args.since)
+    if not spans:
+        print(f"❌ No spans found in {args.directory} (set TRACE_DIR for the services)")
+        return 1
+    traces = build_traces(spans)
+
+    if args.trace:
+        matches = [trace for trace in traces if trace.trace_id.startswith(args.trace)]
+        if not matches:
+            print(f"❌ No trace {args.trace}")
+            return 1
+        for trace in matches:
+            print_waterfall(trace, args.width)
+        return 0
+
+    if args.root:
+        traces = [trace for trace in traces if trace.name == args.root]
+    print(f"📂 {len(spans)} spans in {len(traces)} trace(s) from {args.directory}")
+    print_breakdown(traces)
+    for trace in sorted(traces, key=lambda trace: -trace.duration_us)[:args.slowest]:
+        print_waterfall(trace, args.width)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())